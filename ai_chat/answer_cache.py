@@ -0,0 +1,130 @@
+# Semantic answer cache for the Laws Assistant.
+#
+# Most dashboard traffic repeats a handful of compliance questions. Answers
+# are cached in-process (shared by every Streamlit session), looked up by
+# exact normalized text first and then by nearest neighbour over the query
+# embeddings. The cache is bounded by entry count and TTL, and clears
+# itself whenever the laws index version changes.
+import re
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+ANSWER_CACHE_MAX_ENTRIES = 256
+ANSWER_CACHE_TTL_SECONDS = 6 * 3600
+ANSWER_CACHE_SIMILARITY = 0.92
+
+
+def normalize_query(query):
+    """Lower-case, collapse whitespace and drop trailing punctuation."""
+    text = re.sub(r"\s+", " ", query.strip().lower())
+    return text.rstrip(" ?.!")
+
+
+class AnswerCache:
+    """Thread-safe LRU + TTL cache of answers with semantic lookup.
+
+    Vectors are expected to be L2-normalized, so cosine similarity is a dot
+    product. `version_getter()` returns the current index version; a change
+    empties the cache. Either bound can be disabled by passing None.
+    """
+
+    def __init__(self, max_entries=ANSWER_CACHE_MAX_ENTRIES, ttl_seconds=ANSWER_CACHE_TTL_SECONDS,
+                 similarity_threshold=ANSWER_CACHE_SIMILARITY, version_getter=None, clock=time.time):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        self._version_getter = version_getter or (lambda: None)
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # normalized query -> (vector, answer, created_at)
+        self._matrix = None
+        self._matrix_keys = []
+        self._version = None
+        self._stats = {"exact_hits": 0, "semantic_hits": 0, "misses": 0, "invalidations": 0}
+
+    # ----------------- INTERNALS -----------------
+    def _check_version(self):
+        version = self._version_getter()
+        if version != self._version:
+            if self._entries:
+                self._stats["invalidations"] += 1
+            self._entries.clear()
+            self._matrix = None
+            self._version = version
+
+    def _expired(self, created_at):
+        return self.ttl_seconds is not None and self._clock() - created_at > self.ttl_seconds
+
+    def _purge_expired(self):
+        expired = [k for k, (_, _, created) in self._entries.items() if self._expired(created)]
+        for key in expired:
+            del self._entries[key]
+        if expired:
+            self._matrix = None
+
+    def _vectors(self):
+        if self._matrix is None:
+            self._matrix_keys = [k for k, e in self._entries.items() if e[0] is not None]
+            self._matrix = (
+                np.array([self._entries[k][0] for k in self._matrix_keys], dtype=np.float32)
+                if self._matrix_keys else None
+            )
+        return self._matrix_keys, self._matrix
+
+    # ----------------- PUBLIC API -----------------
+    def get_exact(self, query):
+        """Answer cached for the same normalized question, or None."""
+        key = normalize_query(query)
+        with self._lock:
+            self._check_version()
+            entry = self._entries.get(key)
+            if entry is None or self._expired(entry[2]):
+                return None
+            self._entries.move_to_end(key)
+            self._stats["exact_hits"] += 1
+            return entry[1]
+
+    def get_similar(self, vector):
+        """Answer of the most similar cached question above the threshold, or None."""
+        with self._lock:
+            self._check_version()
+            self._purge_expired()
+            keys, matrix = self._vectors()
+            if matrix is not None:
+                scores = matrix @ np.asarray(vector, dtype=np.float32)
+                best = int(np.argmax(scores))
+                if scores[best] >= self.similarity_threshold:
+                    self._entries.move_to_end(keys[best])
+                    self._stats["semantic_hits"] += 1
+                    return self._entries[keys[best]][1]
+            self._stats["misses"] += 1
+            return None
+
+    def put(self, query, vector, answer):
+        key = normalize_query(query)
+        with self._lock:
+            self._check_version()
+            self._purge_expired()
+            self._entries[key] = (vector, answer, self._clock())
+            self._entries.move_to_end(key)
+            if self.max_entries is not None:
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+            self._matrix = None
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._matrix = None
+
+    def stats(self):
+        with self._lock:
+            out = dict(self._stats)
+            hits = out["exact_hits"] + out["semantic_hits"]
+            lookups = hits + out["misses"]
+            out["hit_rate"] = hits / lookups if lookups else 0.0
+            out["entries"] = len(self._entries)
+            return out
@@ -0,0 +1,183 @@
+# Batched, disk-cached embedding service for law chunks and user queries.
+#
+# Vectors are computed in explicit batches, L2-normalized once by the model,
+# and stored in a small SQLite cache keyed by a hash of (model, text). Re-
+# indexing unchanged chunks or repeating a common question reads the cache
+# instead of running the model. The model itself is only loaded on a miss.
+import os
+import hashlib
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+try:
+    from langchain_core.embeddings import Embeddings
+except Exception:
+    Embeddings = object
+
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+EMBEDDING_CACHE_PATH = os.path.join(BASE_DIR, "embedding_cache.sqlite3")
+
+EMBEDDING_BATCH_SIZE = 64
+MEMORY_CACHE_ITEMS = 2048
+
+
+def _default_model_factory(model_name, batch_size):
+    from langchain_huggingface import HuggingFaceEmbeddings
+
+    return HuggingFaceEmbeddings(
+        model_name=model_name,
+        encode_kwargs={"batch_size": batch_size, "normalize_embeddings": True},
+    )
+
+
+class EmbeddingService(Embeddings):
+    """LangChain-compatible embeddings with batching and a persistent cache.
+
+    `model_factory()` must return an object with `embed_documents(texts)`
+    that yields already-normalized vectors; by default it builds a
+    HuggingFaceEmbeddings with `normalize_embeddings=True`. `memory_probe()`,
+    when given, returns the process RSS in bytes and is used to report the
+    model's memory footprint once it is loaded.
+
+    The cache lock is only held for lookups and stores; the model runs
+    outside it, so queries are not serialized behind a re-index batch.
+    """
+
+    def __init__(self, model_name, batch_size=EMBEDDING_BATCH_SIZE,
+                 cache_path=EMBEDDING_CACHE_PATH, model_factory=None,
+                 memory_items=MEMORY_CACHE_ITEMS, memory_probe=None):
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.cache_path = cache_path
+        self._model_factory = model_factory or (
+            lambda: _default_model_factory(model_name, batch_size)
+        )
+        self._model = None
+        self._memory_probe = memory_probe
+        self._model_lock = threading.Lock()
+        self._lock = threading.RLock()
+        self._memory = OrderedDict()
+        self._memory_items = memory_items
+        self._stats = {
+            "hits": 0, "misses": 0, "model_calls": 0,
+            "model_seconds": 0.0, "model_load_seconds": None,
+            "model_memory_bytes": None,
+        }
+
+        self._db = None
+        if cache_path:
+            os.makedirs(os.path.dirname(cache_path) or ".", exist_ok=True)
+            self._db = sqlite3.connect(cache_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB)"
+            )
+            self._db.commit()
+
+    # ----------------- CACHE -----------------
+    def _key(self, text):
+        return hashlib.sha256(f"{self.model_name}\0{text}".encode("utf-8")).hexdigest()
+
+    def _remember(self, key, vector):
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self._memory_items:
+            self._memory.popitem(last=False)
+
+    def _lookup(self, keys):
+        found = {}
+        for key in keys:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                found[key] = self._memory[key]
+        missing = [k for k in keys if k not in found]
+        if self._db is not None and missing:
+            for i in range(0, len(missing), 500):
+                part = missing[i:i + 500]
+                rows = self._db.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(part))})",
+                    part,
+                ).fetchall()
+                for key, blob in rows:
+                    vector = np.frombuffer(blob, dtype=np.float32).tolist()
+                    found[key] = vector
+                    self._remember(key, vector)
+        return found
+
+    def _store(self, items):
+        for key, vector in items:
+            self._remember(key, vector)
+        if self._db is not None and items:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)",
+                [(k, np.asarray(v, dtype=np.float32).tobytes()) for k, v in items],
+            )
+            self._db.commit()
+
+    # ----------------- MODEL -----------------
+    def _get_model(self):
+        with self._model_lock:
+            if self._model is None:
+                rss_before = self._memory_probe() if self._memory_probe else None
+                start = time.perf_counter()
+                model = self._model_factory()
+                seconds = time.perf_counter() - start
+                with self._lock:
+                    self._stats["model_load_seconds"] = seconds
+                    if rss_before is not None:
+                        self._stats["model_memory_bytes"] = max(self._memory_probe() - rss_before, 0)
+                self._model = model
+                print(f"Embedding model {self.model_name} loaded in {seconds:.2f}s")
+        return self._model
+
+    def _compute(self, texts):
+        model = self._get_model()
+        vectors, seconds, calls = [], 0.0, 0
+        for i in range(0, len(texts), self.batch_size):
+            start = time.perf_counter()
+            vectors.extend(model.embed_documents(texts[i:i + self.batch_size]))
+            seconds += time.perf_counter() - start
+            calls += 1
+        with self._lock:
+            self._stats["model_seconds"] += seconds
+            self._stats["model_calls"] += calls
+        return [list(map(float, v)) for v in vectors]
+
+    # ----------------- EMBEDDINGS API -----------------
+    def embed_documents(self, texts):
+        texts = list(texts)
+        with self._lock:
+            keys = [self._key(t) for t in texts]
+            found = self._lookup(list(dict.fromkeys(keys)))
+
+            pending = {}
+            for key, text in zip(keys, texts):
+                if key not in found and key not in pending:
+                    pending[key] = text
+            # Repeats of a pending text inside one call count as hits
+            self._stats["misses"] += len(pending)
+            self._stats["hits"] += len(texts) - len(pending)
+
+        if pending:
+            vectors = self._compute(list(pending.values()))
+            computed = list(zip(pending.keys(), vectors))
+            with self._lock:
+                self._store(computed)
+            found.update(computed)
+        return [found[k] for k in keys]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+    def stats(self):
+        with self._lock:
+            out = dict(self._stats)
+            lookups = out["hits"] + out["misses"]
+            out["hit_rate"] = out["hits"] / lookups if lookups else 0.0
+            out["model_loaded"] = self._model is not None
+            out["batch_size"] = self.batch_size
+            return out
@@ -0,0 +1,163 @@
+# Incremental, content-hashed maintenance of the laws vector index.
+#
+# A JSON manifest next to the Chroma files records, for every indexed PDF,
+# its file hash and the hash + chunk IDs of each page. An update run only
+# loads PDFs whose file hash changed, only re-embeds pages whose text hash
+# changed, and deletes the chunk IDs of pages or PDFs that disappeared.
+import os
+import json
+import hashlib
+import time
+
+from atomic_io import write_text_atomic
+from ai_chat.law_ingest import file_sha256
+
+MANIFEST_NAME = "index_manifest.json"
+MANIFEST_VERSION = 1
+
+
+# ----------------- MANIFEST -----------------
+def manifest_path(persist_dir):
+    return os.path.join(persist_dir, MANIFEST_NAME)
+
+
+def index_version(persist_dir):
+    """Cheap version stamp of the index; changes whenever the manifest is rewritten."""
+    try:
+        st = os.stat(manifest_path(persist_dir))
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+def empty_manifest(settings):
+    return {"version": MANIFEST_VERSION, "settings": settings, "files": {}}
+
+
+def load_manifest(persist_dir):
+    """Return the saved manifest, or None when the index has none."""
+    path = manifest_path(persist_dir)
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_manifest(persist_dir, manifest):
+    """Atomically write the manifest."""
+    os.makedirs(persist_dir, exist_ok=True)
+    write_text_atomic(manifest_path(persist_dir), json.dumps(manifest, indent=1, sort_keys=True))
+
+
+def text_sha256(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def chunk_id(source, page, page_hash, index):
+    """Stable ID of the `index`-th chunk of one version of a page."""
+    key = f"{source}|{page}|{page_hash}|{index}"
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()
+
+
+# ----------------- INDEXER -----------------
+def _all_chunk_ids(file_entry):
+    return [cid for page in file_entry["pages"].values() for cid in page["chunk_ids"]]
+
+
+def _delete_ids(vectordb, ids, batch_size=5000):
+    for i in range(0, len(ids), batch_size):
+        vectordb.delete(ids=ids[i:i + batch_size])
+
+
+def _reset_collection(vectordb):
+    """Remove every chunk, e.g. one left by a full rebuild without a manifest."""
+    existing = vectordb.get(include=[])["ids"]
+    if existing:
+        print(f"Index has no usable manifest; removing {len(existing)} untracked chunks")
+        _delete_ids(vectordb, existing)
+
+
+def update_index(vectordb, pdf_folder, persist_dir, load_pages, split_text, settings):
+    """Bring `vectordb` in line with the PDFs currently in `pdf_folder`.
+
+    `load_pages(paths)` returns {filename: [(page_number, text), ...]} for the
+    given PDF paths and is only called for new or modified files.
+    `split_text(text)` returns the chunk strings for one page.
+    `settings` (embedding model, chunking parameters, ...) is stored in the
+    manifest; when it differs from the saved one the index is rebuilt.
+
+    Returns a summary dict with the number of files and chunks touched.
+    """
+    start = time.perf_counter()
+    manifest = load_manifest(persist_dir)
+    if manifest is None or manifest.get("version") != MANIFEST_VERSION \
+            or manifest.get("settings") != settings:
+        _reset_collection(vectordb)
+        manifest = empty_manifest(settings)
+
+    summary = {
+        "unchanged_files": 0, "added_files": 0, "updated_files": 0, "removed_files": 0,
+        "added_chunks": 0, "deleted_chunks": 0, "kept_pages": 0,
+    }
+
+    on_disk = {
+        f: file_sha256(os.path.join(pdf_folder, f))
+        for f in sorted(os.listdir(pdf_folder)) if f.lower().endswith(".pdf")
+    }
+
+    # Removed PDFs: drop all of their chunks
+    for name in [n for n in manifest["files"] if n not in on_disk]:
+        ids = _all_chunk_ids(manifest["files"].pop(name))
+        _delete_ids(vectordb, ids)
+        summary["removed_files"] += 1
+        summary["deleted_chunks"] += len(ids)
+        print(f"Removed {name} ({len(ids)} chunks)")
+    if summary["removed_files"]:
+        save_manifest(persist_dir, manifest)
+
+    changed = [n for n, h in on_disk.items() if manifest["files"].get(n, {}).get("sha256") != h]
+    summary["unchanged_files"] = len(on_disk) - len(changed)
+    loaded = load_pages([os.path.join(pdf_folder, n) for n in changed])
+
+    for name in changed:
+        old_pages = manifest["files"].get(name, {}).get("pages", {})
+        new_pages = {}
+        texts, metadatas, ids = [], [], []
+
+        for page_no, text in loaded.get(name, []):
+            key = str(page_no)
+            page_hash = text_sha256(text)
+            old = old_pages.get(key)
+            if old is not None and old["sha256"] == page_hash:
+                new_pages[key] = old
+                summary["kept_pages"] += 1
+                continue
+
+            page_ids = []
+            if text.strip():
+                for i, chunk in enumerate(split_text(text)):
+                    cid = chunk_id(name, page_no, page_hash, i)
+                    texts.append(chunk)
+                    metadatas.append({"source": name, "page": page_no, "page_sha256": page_hash})
+                    ids.append(cid)
+                    page_ids.append(cid)
+            new_pages[key] = {"sha256": page_hash, "chunk_ids": page_ids}
+
+        stale = [
+            cid for key, page in old_pages.items()
+            if new_pages.get(key) is not page for cid in page["chunk_ids"]
+        ]
+        _delete_ids(vectordb, stale)
+        if texts:
+            vectordb.add_texts(texts=texts, metadatas=metadatas, ids=ids)
+
+        summary["updated_files" if name in manifest["files"] else "added_files"] += 1
+        summary["added_chunks"] += len(ids)
+        summary["deleted_chunks"] += len(stale)
+        manifest["files"][name] = {"sha256": on_disk[name], "pages": new_pages}
+        # Save after every file so an interrupted run keeps the finished ones
+        save_manifest(persist_dir, manifest)
+        print(f"Indexed {name}: +{len(ids)} / -{len(stale)} chunks")
+
+    summary["seconds"] = time.perf_counter() - start
+    return summary
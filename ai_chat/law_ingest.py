@@ -0,0 +1,336 @@
+# Streaming, parallel and resumable OCR ingestion for the laws PDFs.
+#
+# Most government PDFs carry a text layer, so `load_pdf_pages` reads it first
+# and only sends pages with missing or garbled text to OCR. Each PDF is split
+# into small page ranges. Worker processes rasterize one range at a time (so
+# only a few page images are ever in memory), OCR them, and checkpoint every
+# finished page to disk. Re-running after a crash or a redeploy skips pages
+# that already have a checkpoint.
+import os
+import re
+import json
+import hashlib
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from atomic_io import write_text_atomic
+
+OCR_AVAILABLE = False
+OCR_IMPORT_ERROR = None
+
+try:
+    from pdf2image import convert_from_path, pdfinfo_from_path
+    import pytesseract
+
+    OCR_AVAILABLE = True
+except Exception as e:
+    OCR_AVAILABLE = False
+    OCR_IMPORT_ERROR = str(e)
+
+NATIVE_AVAILABLE = False
+NATIVE_IMPORT_ERROR = None
+
+try:
+    from pypdf import PdfReader
+
+    NATIVE_AVAILABLE = True
+except Exception as e:
+    NATIVE_AVAILABLE = False
+    NATIVE_IMPORT_ERROR = str(e)
+
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+CHECKPOINT_DIR = os.path.join(BASE_DIR, "ocr_checkpoints")
+
+PAGES_PER_CHUNK = 4
+OCR_DPI = 200
+OCR_LANG = "eng"
+
+# A native text page is trusted when it has at least this many characters
+# and this share of them are letters, digits, whitespace or punctuation.
+MIN_NATIVE_CHARS = 50
+MIN_NATIVE_CLEAN_RATIO = 0.85
+_CLEAN_PUNCTUATION = set(".,;:!?()[]'\"-/%&°§’‘“”–—")
+
+
+# ----------------- HELPERS -----------------
+def file_sha256(path, block_size=1 << 20):
+    """Content hash of a file, read in blocks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _safe_stem(filename):
+    stem = os.path.splitext(os.path.basename(filename))[0]
+    return re.sub(r"[^A-Za-z0-9_.-]+", "_", stem)
+
+
+def checkpoint_dir_for(pdf_path, file_hash, checkpoint_root=CHECKPOINT_DIR):
+    """Checkpoint folder for one version (hash) of a PDF."""
+    return os.path.join(checkpoint_root, f"{_safe_stem(pdf_path)}-{file_hash[:16]}")
+
+
+def _page_path(ckpt_dir, page):
+    return os.path.join(ckpt_dir, f"page_{page:05d}.txt")
+
+
+def _write_page(ckpt_dir, page, text):
+    """Atomically write one page checkpoint."""
+    write_text_atomic(_page_path(ckpt_dir, page), text)
+
+
+def _read_page(ckpt_dir, page):
+    with open(_page_path(ckpt_dir, page), encoding="utf-8") as f:
+        return f.read()
+
+
+def _drop_stale_checkpoints(pdf_path, ckpt_dir, checkpoint_root=CHECKPOINT_DIR):
+    """Remove checkpoints left by older versions of the same PDF.
+
+    Folder names are "<stem>-<fingerprint>"; the whole stem must match, so
+    "Law.pdf" never touches the checkpoints of "Law-amending-....pdf".
+    """
+    stem = _safe_stem(pdf_path)
+    if not os.path.isdir(checkpoint_root):
+        return
+    for name in os.listdir(checkpoint_root):
+        path = os.path.join(checkpoint_root, name)
+        other_stem, _, fingerprint = name.rpartition("-")
+        if other_stem != stem or not re.fullmatch(r"[0-9a-f]{16}", fingerprint):
+            continue
+        if path != ckpt_dir and os.path.isdir(path):
+            for f in os.listdir(path):
+                os.remove(os.path.join(path, f))
+            os.rmdir(path)
+
+
+def page_count(pdf_path, poppler_path=None):
+    info = pdfinfo_from_path(pdf_path, poppler_path=poppler_path)
+    return int(info["Pages"])
+
+
+def page_ranges(pages, pages_per_chunk=PAGES_PER_CHUNK):
+    """Group 1-based page numbers into contiguous (first, last) ranges."""
+    ranges = []
+    for page in sorted(pages):
+        if ranges and page == ranges[-1][1] + 1 and page - ranges[-1][0] < pages_per_chunk:
+            ranges[-1] = (ranges[-1][0], page)
+        else:
+            ranges.append((page, page))
+    return ranges
+
+
+# ----------------- WORKER -----------------
+def _ocr_page_range(pdf_path, first, last, ckpt_dir, poppler_path, tesseract_cmd, lang, dpi):
+    """Rasterize and OCR pages `first`..`last`, checkpointing each page.
+
+    Runs inside a worker process; only this range is ever held in memory.
+    """
+    if tesseract_cmd:
+        pytesseract.pytesseract.tesseract_cmd = tesseract_cmd
+
+    images = convert_from_path(
+        pdf_path,
+        dpi=dpi,
+        first_page=first,
+        last_page=last,
+        poppler_path=poppler_path,
+    )
+    done = []
+    start = time.perf_counter()
+    for offset, image in enumerate(images):
+        page = first + offset
+        text = pytesseract.image_to_string(image, lang=lang)
+        _write_page(ckpt_dir, page, text)
+        image.close()
+        done.append(page)
+    return done, time.perf_counter() - start
+
+
+# ----------------- ENGINE -----------------
+class _PdfJob:
+    """Checkpoint state and pending page ranges for one PDF."""
+
+    def __init__(self, pdf_path, poppler_path, pages, pages_per_chunk, checkpoint_root,
+                 file_hash=None, n_pages=None):
+        self.pdf_path = pdf_path
+        self.name = os.path.basename(pdf_path)
+        self.file_hash = file_hash or file_sha256(pdf_path)
+        self.ckpt_dir = checkpoint_dir_for(pdf_path, self.file_hash, checkpoint_root)
+        os.makedirs(self.ckpt_dir, exist_ok=True)
+        _drop_stale_checkpoints(pdf_path, self.ckpt_dir, checkpoint_root)
+
+        self.n_pages = n_pages or page_count(pdf_path, poppler_path)
+        self.ocr_seconds = 0.0
+        self.wanted = sorted(pages) if pages is not None else list(range(1, self.n_pages + 1))
+        todo = [p for p in self.wanted if not os.path.exists(_page_path(self.ckpt_dir, p))]
+        self.ranges = page_ranges(todo, pages_per_chunk)
+        self.finished = len(self.wanted) - len(todo)
+        print(f"  {self.name}: {self.finished}/{len(self.wanted)} pages already checkpointed")
+
+    def submit(self, executor, poppler_path, tesseract_cmd, lang, dpi):
+        return [
+            executor.submit(
+                _ocr_page_range, self.pdf_path, first, last, self.ckpt_dir,
+                poppler_path, tesseract_cmd, lang, dpi
+            )
+            for first, last in self.ranges
+        ]
+
+    def collect(self):
+        with open(os.path.join(self.ckpt_dir, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump({"source": self.name, "sha256": self.file_hash, "pages": self.n_pages}, f)
+        return [(p, _read_page(self.ckpt_dir, p)) for p in self.wanted]
+
+
+def _run_jobs(jobs, executor, poppler_path, tesseract_cmd, lang, dpi):
+    """Submit every job's page ranges up front so the pool never idles between PDFs."""
+    owner = {}
+    for job in jobs:
+        for future in job.submit(executor, poppler_path, tesseract_cmd, lang, dpi):
+            owner[future] = job
+    for future in as_completed(owner):
+        job = owner[future]
+        done, seconds = future.result()
+        job.finished += len(done)
+        job.ocr_seconds += seconds
+        print(f"  {job.name}: {job.finished}/{len(job.wanted)} pages")
+    return {job.name: job.collect() for job in jobs}
+
+
+def ocr_pdf(pdf_path, executor, poppler_path=None, tesseract_cmd=None, lang=OCR_LANG,
+            dpi=OCR_DPI, pages_per_chunk=PAGES_PER_CHUNK, pages=None,
+            checkpoint_root=CHECKPOINT_DIR):
+    """OCR one PDF on `executor`, resuming from any existing page checkpoints.
+
+    `pages` optionally restricts OCR to a subset of 1-based page numbers.
+    Returns a list of (page_number, text) sorted by page.
+    """
+    job = _PdfJob(pdf_path, poppler_path, pages, pages_per_chunk, checkpoint_root)
+    return _run_jobs([job], executor, poppler_path, tesseract_cmd, lang, dpi)[job.name]
+
+
+def ocr_pdf_files(pdf_paths, poppler_path=None, tesseract_cmd=None, lang=OCR_LANG,
+                  dpi=OCR_DPI, max_workers=None, pages_per_chunk=PAGES_PER_CHUNK,
+                  checkpoint_root=CHECKPOINT_DIR):
+    """OCR the given PDFs on one process pool sized to the CPU count.
+
+    Returns {filename: [(page_number, text), ...]}.
+    """
+    if not OCR_AVAILABLE:
+        raise RuntimeError(f"OCR dependencies unavailable: {OCR_IMPORT_ERROR}")
+    if not pdf_paths:
+        return {}
+
+    jobs = [
+        _PdfJob(path, poppler_path, None, pages_per_chunk, checkpoint_root)
+        for path in pdf_paths
+    ]
+    workers = max_workers or os.cpu_count() or 1
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        results = _run_jobs(jobs, executor, poppler_path, tesseract_cmd, lang, dpi)
+    print(f"OCR finished in {time.perf_counter() - start:.1f}s using {workers} workers")
+    return results
+
+
+def ocr_pdf_folder(folder, **kwargs):
+    """OCR every PDF in `folder`; see `ocr_pdf_files` for the options."""
+    pdf_files = sorted(f for f in os.listdir(folder) if f.lower().endswith(".pdf"))
+    print(f"Found {len(pdf_files)} PDFs in {folder}")
+    return ocr_pdf_files([os.path.join(folder, f) for f in pdf_files], **kwargs)
+
+
+# ----------------- HYBRID (NATIVE TEXT + OCR) -----------------
+def native_text_ok(text, min_chars=MIN_NATIVE_CHARS, min_clean_ratio=MIN_NATIVE_CLEAN_RATIO):
+    """True when an extracted text layer looks usable without OCR."""
+    stripped = text.strip()
+    if len(stripped) < min_chars:
+        return False
+    clean = sum(c.isalnum() or c.isspace() or c in _CLEAN_PUNCTUATION for c in stripped)
+    return clean / len(stripped) >= min_clean_ratio
+
+
+def extract_native_pages(pdf_path):
+    """Text layer of every page as [(page_number, text), ...].
+
+    Returns [] when the PDF cannot be read (corrupt or encrypted), so the
+    whole file goes through OCR.
+    """
+    try:
+        reader = PdfReader(pdf_path)
+        pdf_pages = list(reader.pages)
+    except Exception as e:
+        print(f"  {os.path.basename(pdf_path)}: no readable text layer ({e}); using OCR")
+        return []
+    pages = []
+    for i, page in enumerate(pdf_pages):
+        try:
+            text = page.extract_text() or ""
+        except Exception:
+            text = ""
+        pages.append((i + 1, text))
+    return pages
+
+
+def load_pdf_pages(pdf_paths, poppler_path=None, tesseract_cmd=None, lang=OCR_LANG,
+                   dpi=OCR_DPI, max_workers=None, pages_per_chunk=PAGES_PER_CHUNK,
+                   checkpoint_root=CHECKPOINT_DIR, min_chars=MIN_NATIVE_CHARS,
+                   min_clean_ratio=MIN_NATIVE_CLEAN_RATIO):
+    """Read each PDF's text layer and OCR only the pages where it is unusable.
+
+    Returns (pages, report) where `pages` is {filename: [(page_number, text), ...]}
+    and `report` is {filename: {"native_pages", "ocr_pages", "native_seconds",
+    "ocr_seconds"}}. Without pypdf every page goes through OCR.
+    """
+    pages, report, pending = {}, {}, []
+
+    for path in pdf_paths:
+        name = os.path.basename(path)
+        start = time.perf_counter()
+        native = extract_native_pages(path) if NATIVE_AVAILABLE else []
+        native_seconds = time.perf_counter() - start
+
+        good = {p: t for p, t in native if native_text_ok(t, min_chars, min_clean_ratio)}
+        pages[name] = sorted(good.items())
+        report[name] = {
+            "native_pages": len(good),
+            "ocr_pages": 0,
+            "native_seconds": native_seconds,
+            "ocr_seconds": 0.0,
+        }
+
+        if native:
+            need_ocr = [p for p, _ in native if p not in good]
+            if need_ocr:
+                pending.append((path, need_ocr, len(native)))
+        else:
+            pending.append((path, None, None))
+
+    if pending:
+        # Checked before any job is built: _PdfJob needs pdf2image to count pages
+        if not OCR_AVAILABLE:
+            raise RuntimeError(f"OCR dependencies unavailable: {OCR_IMPORT_ERROR}")
+        jobs = [
+            _PdfJob(path, poppler_path, need_ocr, pages_per_chunk, checkpoint_root,
+                    n_pages=n_pages)
+            for path, need_ocr, n_pages in pending
+        ]
+        workers = max_workers or os.cpu_count() or 1
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            ocr_results = _run_jobs(jobs, executor, poppler_path, tesseract_cmd, lang, dpi)
+        for job in jobs:
+            ocr_pages = ocr_results[job.name]
+            pages[job.name] = sorted(pages[job.name] + ocr_pages)
+            report[job.name]["ocr_pages"] = len(ocr_pages)
+            report[job.name]["ocr_seconds"] = job.ocr_seconds
+
+    for name, r in report.items():
+        print(
+            f"  {name}: {r['native_pages']} native pages ({r['native_seconds']:.1f}s), "
+            f"{r['ocr_pages']} OCR pages ({r['ocr_seconds']:.1f}s)"
+        )
+    return pages, report
@@ -1,8 +1,16 @@
 import pandas as pd
 import os
+import atexit
+import hashlib
+import threading
+import time
 from dotenv import load_dotenv
 from difflib import get_close_matches
 
+from ai_chat.streaming import stream_text, cached_text
+from ai_chat.sandbox import SandboxExecutor
+from ai_chat.query_cache import QueryCache
+
 load_dotenv()
 
 # Detect optional Google Gemini support
@@ -15,6 +23,71 @@ except Exception as e:
     genai_available = False
     genai_err = str(e)
 
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_PATH = os.path.join(BASE_DIR, "data", "merged_predictions.csv")
+GEMINI_MODEL = "gemini-2.5-flash"
+
+_lock = threading.Lock()
+_data_cache = {"mtime": None, "df": None}
+_model_cache = {"model": None}
+_sandbox = {"executor": None}
+_query_cache = {"cache": None}
+
+
+def get_dataframe(path=DATA_PATH):
+    """Return the export dataset, re-reading the CSV only when its mtime changes."""
+    mtime = os.path.getmtime(path)
+    with _lock:
+        if _data_cache["df"] is None or _data_cache["mtime"] != mtime:
+            _data_cache["df"] = pd.read_csv(path)
+            _data_cache["mtime"] = mtime
+        return _data_cache["df"]
+
+
+def dataset_hash(df):
+    """Content fingerprint of a frame (values, index and column names)."""
+    digest = hashlib.sha256(",".join(map(str, df.columns)).encode("utf-8"))
+    digest.update(pd.util.hash_pandas_object(df, index=True).values.tobytes())
+    return digest.hexdigest()
+
+
+def result_fingerprint(result):
+    """Fingerprint of a query result, used to reuse its explanation."""
+    try:
+        if isinstance(result, pd.Series):
+            result = result.to_frame()
+        if isinstance(result, pd.DataFrame):
+            return dataset_hash(result)
+    except TypeError:
+        pass  # unhashable cells (lists, dicts): fall back to the repr
+    return hashlib.sha256(repr(result).encode("utf-8")).hexdigest()
+
+
+def get_query_cache():
+    """Shared persistent question -> pandas code cache."""
+    with _lock:
+        if _query_cache["cache"] is None:
+            _query_cache["cache"] = QueryCache()
+        return _query_cache["cache"]
+
+
+def get_sandbox():
+    """Shared pool of sandbox workers, started on first use."""
+    with _lock:
+        if _sandbox["executor"] is None:
+            _sandbox["executor"] = SandboxExecutor()
+            atexit.register(_sandbox["executor"].shutdown)
+        return _sandbox["executor"]
+
+
+def get_model():
+    """Configure Gemini once and return the shared GenerativeModel."""
+    with _lock:
+        if _model_cache["model"] is None:
+            genai.configure(api_key=os.getenv('GEMINI_API_KEY'))
+            _model_cache["model"] = genai.GenerativeModel(GEMINI_MODEL)
+        return _model_cache["model"]
+
 
 def map_user_terms_to_columns(question, df):
     question_lower = question.lower()
@@ -45,15 +118,34 @@ def map_user_terms_to_columns(question, df):
     return list(column_map.values())
 
 
-def explain_result_human(result):
-    """Return a human-friendly explanation for `result`.
+def _fallback_explanation(result):
+    """Brief summary used when Gemini is unavailable."""
+    if isinstance(result, pd.DataFrame):
+        return (
+            f"Returned DataFrame with {len(result)} rows and columns {list(result.columns)}. "
+            f"Sample (up to 3 rows): {result.head(3).to_dict()}"
+        )
+    return str(result)
 
-    If Gemini is available, use it; otherwise provide a concise fallback.
+
+def stream_explanation(result):
+    """Yield a human-friendly explanation of `result` as Gemini streams it.
+
+    Falls back to a one-piece summary if Gemini is unavailable or fails
+    before producing any text. Explanations are cached by result
+    fingerprint, so an identical result is never sent to Gemini twice.
     """
+    start = time.perf_counter()
+    fingerprint = result_fingerprint(result)
+    cached = get_query_cache().get_explanation(fingerprint)
+    if cached is not None:
+        yield from cached_text(cached, "export_assistant")
+        return
+
+    produced = False
     if genai_available:
         try:
-            genai.configure(api_key=os.getenv('GEMINI_API_KEY'))
-            model = genai.GenerativeModel("gemini-2.5-flash")
+            model = get_model()
             if isinstance(result, pd.DataFrame):
                 result_str = result.head(10).to_dict()
             else:
@@ -66,29 +158,43 @@ Explain the following data/result in simple language and give actionable advice
 
 Keep the answer short, structured, and highlight key points.
 """
-            return model.generate_content(prompt).text
+            response = model.generate_content(prompt, stream=True)
+            pieces = []
+            for text in stream_text(response, "export_assistant", start):
+                produced = True
+                pieces.append(text)
+                yield text
+            get_query_cache().put_explanation(fingerprint, "".join(pieces))
         except Exception:
-            pass
+            if produced:
+                return
 
-    # Fallback (no AI): brief summary
-    if isinstance(result, pd.DataFrame):
-        return (
-            f"Returned DataFrame with {len(result)} rows and columns {list(result.columns)}. "
-            f"Sample (up to 3 rows): {result.head(3).to_dict()}"
-        )
-    return str(result)
+    if not produced:
+        yield _fallback_explanation(result)
+
+
+def explain_result_human(result):
+    """Return a human-friendly explanation for `result`.
+
+    If Gemini is available, use it; otherwise provide a concise fallback.
+    """
+    return "".join(stream_explanation(result))
 
 
-def ask_pandas_agent(question):
+def ask_pandas_agent(question, explain=True, df=None):
     """Generate a pandas query (via Gemini) and execute it against the dataset.
 
     This function is defensive:
-    - loads `data/merged_predictions.csv` lazily
+    - uses the caller's already-loaded `df` when given, otherwise the
+      module-level copy of `data/merged_predictions.csv` (see `get_dataframe`)
     - returns helpful error messages when AI or data is unavailable
+
+    With `explain=False` the explanation is left as None so the caller can
+    stream it with `stream_explanation(result)`.
     """
-    # Load dataset lazily
     try:
-        df = pd.read_csv("data/merged_predictions.csv")
+        if df is None:
+            df = get_dataframe()
     except Exception as e:
         return {
             "query": None,
@@ -97,6 +203,17 @@ def ask_pandas_agent(question):
             "error": f"Could not load data/merged_predictions.csv: {e}"
         }
 
+    # Known question on the same data version: re-run its validated code
+    # locally instead of asking Gemini to write it again.
+    data_hash = dataset_hash(df)
+    query_cache = get_query_cache()
+    cached = query_cache.get(question, data_hash)
+    if cached is not None:
+        run = get_sandbox().run(cached["code"], df, data_hash)
+        if run["error"] is None and run["result"] is not None:
+            return _agent_response(cached["code"], run, explain, cached=True)
+        query_cache.discard(question)
+
     matched_cols = map_user_terms_to_columns(question, df)
 
     system_prompt = f"""
@@ -128,9 +245,7 @@ Rules:
 
     # Request Gemini to generate pandas code
     try:
-        genai.configure(api_key=os.getenv('GEMINI_API_KEY'))
-        model = genai.GenerativeModel("gemini-2.5-flash")
-        response = model.generate_content(question + "\n" + system_prompt)
+        response = get_model().generate_content(question + "\n" + system_prompt)
         pandas_code = response.text.strip()
     except Exception as e:
         return {
@@ -140,205 +255,37 @@ Rules:
             "error": f"AI generation failed: {e}"
         }
 
-    # Execute generated code safely (best-effort)
-    local_vars = {"df": df}
-    result = None
-    error = None
-
-    try:
-        result = eval(pandas_code, {"df": df}, {})
-        if not isinstance(result, pd.DataFrame):
-            try:
-                result = pd.DataFrame(result)
-            except Exception:
-                pass
-    except Exception:
-        try:
-            exec(pandas_code, {}, local_vars)
-            result = local_vars.get("result", None)
-        except Exception as e:
-            error = str(e)
-
-    explanation = None
-    if result is not None:
-        explanation = explain_result_human(result)
-
-    return {
-        "query": pandas_code,
-        "result": result,
-        "explanation": explanation,
-        "error": error
-    }
-
-
-if __name__ == "__main__":
-    q = "I'm in minerals, what products should I invest in, and why?"
-    out = ask_pandas_agent(q)
-    print("Generated Query:\n", out.get("query"))
-    if out.get("result") is not None:
-        print("\nResult (sample):\n", out["result"].head(10) if isinstance(out["result"], pd.DataFrame) else out["result"])
-        print("\n--- Human Explanation ---\n", out["explanation"])
-    else:
-        print("\nError:", out.get("error"))
-import pandas as pd
-import os
-from dotenv import load_dotenv
-from difflib import get_close_matches
-
-load_dotenv()
-
-genai_available = False
-genai_err = None
-try:
-    import google.generativeai as genai
-    genai_available = True
-except Exception as e:
-    genai_available = False
-    genai_err = str(e)
-
-df = pd.read_csv("data/merged_predictions.csv")
-
-
-
-from difflib import get_close_matches
-
-def map_user_terms_to_columns(question, df):
-    question_lower = question.lower()
-    columns = list(df.columns)
-    column_map = {}
-
-    for col in columns:
-        col_lower = col.lower()
-
-        # Direct substring match
-        if col_lower in question_lower:
-            column_map[col] = col
-            continue
-
-        # Check if any word in column appears in question
-        col_words = col_lower.replace("_", " ").split()
-        for word in col_words:
-            if word in question_lower:
-                column_map[col] = col
-                break
-
-        # Fuzzy match (80%+ similarity)
-        if col not in column_map:
-            matches = get_close_matches(col_lower, [question_lower], cutoff=0.8)
-            if matches:
-                column_map[col] = col
-
-    return list(column_map.values())
-
-
-
-
-
-
-
-
-def explain_result_human(result):
-    """Convert pandas result to simple advice for the user"""
-    if isinstance(result, pd.DataFrame):
-        result_str = result.head(10).to_dict()  # limit to top 10 rows
-    else:
-        result_str = str(result)
-
-    prompt = f"""
-Explain the following data/result in simple language and give actionable advice if relevant:
-
-{result_str}
-
-Only provide actionable insights, avoid technical code explanations. and if possible at the bottom you can do advanced research in Rwanda analyze it's trade landmark and find different opportunities both locally and globally that can support the user 
-
-and make sure in a creative way your answer is well structured so that the user can easily follow them and get insights from them
+    # Execute generated code in a sandboxed worker process with CPU-time,
+    # wall-clock and memory limits, against a private copy of the data.
+    run = get_sandbox().run(pandas_code, df, data_hash)
+    if run["error"] is None and run["result"] is not None:
+        query_cache.put(question, data_hash, pandas_code, result_fingerprint(run["result"]))
 
-but also remember to summarize and highlight titles , since users follow well summarized content remember to summarize and highlight important key points.
-"""
-    explanation = MODEL.generate_content(prompt).text
-    return explanation
-
-
-def ask_pandas_agent(question):
-    """AI → generate pandas code → execute → return result + human explanation"""
-
-    
-    matched_cols = map_user_terms_to_columns(question, df)
-
-    system_prompt = f"""
-    You are an AI that converts natural language questions into valid pandas code.
-    Use ONLY this dataframe named `df`.
-
-    df columns: {list(df.columns)}
-
-    Relevant columns detected from the user question: {matched_cols}
+    return _agent_response(pandas_code, run, explain, cached=False)
 
-    Mapping rules:
-    - you must be analytical in matching column names , for example
-    A user can ask i work in agriculture ,so find columns in {list(df.columns)} that are relevant to agriculture , like livestock and food stuffs , 
-    or a user asks i work in minerals so you must check in the provided columns  {list(df.columns)} and first the relevant columns
 
-    so you must first check what are the relevant columns in  {list(df.columns)}  can use to generate to generate relevant codes depending on df dataframe, and to arrive at you final result 
-    first check relevant if you used relevant columns in mapping.
-
-    Rules:
-    - Return ONLY python code (no backticks)
-    - Assign the final output to a variable named 'result'
-    - 'result' MUST be a DataFrame or convertible to DataFrame
-    - Do NOT modify df
-    - Do NOT use imports, os, eval, or unsafe operations
-    """
-
-
-    # 2. Ask AI to generate pandas code
-    response = MODEL.generate_content(question + "\n" + system_prompt)
-    pandas_code = response.text.strip()
-
-    # 3. Try to execute code safely
-    local_vars = {"df": df}
-    result = None
-    error = None
-
-    # Try eval first (for single-line expressions)
-    try:
-        result = eval(pandas_code, {"df": df})
-    except:
-        # Fallback to exec for multi-line code
-        try:
-            exec(pandas_code, {}, local_vars)
-            result = local_vars.get("result", None)
-        except Exception as e:
-            error = str(e)
-                try:
-                    df = pd.read_csv("data/merged_predictions.csv")
-                except Exception as e:
-                    return {
-                        "query": None,
-                        "result": None,
-                        "explanation": None,
-                        "error": f"Could not load data/merged_predictions.csv: {e}"
-                    }
-    # 4. Explain result
+def _agent_response(pandas_code, run, explain, cached):
+    result = run["result"]
     explanation = None
-    if result is not None:
+    if result is not None and explain:
         explanation = explain_result_human(result)
 
     return {
         "query": pandas_code,
         "result": result,
         "explanation": explanation,
-        "error": error
+        "error": run["error"],
+        "error_type": run["error_type"],
+        "cached": cached
     }
 
 
 if __name__ == "__main__":
     q = "I'm in minerals, what products should I invest in, and why?"
     out = ask_pandas_agent(q)
-    
     print("Generated Query:\n", out.get("query"))
     if out.get("result") is not None:
         print("\nResult (sample):\n", out["result"].head(10) if isinstance(out["result"], pd.DataFrame) else out["result"])
         print("\n--- Human Explanation ---\n", out["explanation"])
     else:
         print("\nError:", out.get("error"))
-
@@ -0,0 +1,132 @@
+# Persistent compiled-query cache for the Export Data Assistant.
+#
+# Maps a normalized question to the pandas code Gemini generated for it (only
+# after that code ran successfully) plus a fingerprint of its result. A repeat
+# question re-runs the cached code locally against the current data instead
+# of calling the LLM. Entries are tied to the dataset hash they were built on
+# and are evicted as soon as the data changes. Explanations are cached by
+# result fingerprint, so an unchanged result is not explained twice.
+import os
+import sqlite3
+import threading
+import time
+
+from ai_chat.answer_cache import normalize_query
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+QUERY_CACHE_PATH = os.path.join(BASE_DIR, "query_cache.sqlite3")
+MAX_EXPLANATIONS = 1000
+
+
+class QueryCache:
+    """SQLite-backed question -> code cache, scoped to one dataset hash."""
+
+    def __init__(self, path=QUERY_CACHE_PATH, max_explanations=MAX_EXPLANATIONS):
+        self.path = path
+        self.max_explanations = max_explanations
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS queries (
+                question TEXT PRIMARY KEY,
+                data_hash TEXT NOT NULL,
+                code TEXT NOT NULL,
+                result_fingerprint TEXT,
+                hits INTEGER NOT NULL DEFAULT 0,
+                created REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS explanations (
+                result_fingerprint TEXT PRIMARY KEY,
+                explanation TEXT NOT NULL,
+                used REAL NOT NULL
+            );
+        """)
+        self._db.commit()
+        self._stats = {"hits": 0, "misses": 0, "evicted": 0, "explanation_hits": 0}
+        self._data_hash = None  # dataset hash the table was last evicted for
+
+    # ----------------- QUERIES -----------------
+    def evict_stale(self, data_hash):
+        """Drop every entry built against a different dataset version."""
+        with self._lock:
+            cur = self._db.execute("DELETE FROM queries WHERE data_hash != ?", (data_hash,))
+            self._db.commit()
+            self._data_hash = data_hash
+            self._stats["evicted"] += cur.rowcount
+            return cur.rowcount
+
+    def get(self, question, data_hash):
+        """Cached {"code", "result_fingerprint"} for this question and data, or None.
+
+        Stale entries are evicted once, the first time a new data hash is seen.
+        """
+        if data_hash != self._data_hash:
+            self.evict_stale(data_hash)
+        key = normalize_query(question)
+        with self._lock:
+            row = self._db.execute(
+                "SELECT code, result_fingerprint FROM queries WHERE question = ? AND data_hash = ?",
+                (key, data_hash),
+            ).fetchone()
+            if row is None:
+                self._stats["misses"] += 1
+                return None
+            self._db.execute("UPDATE queries SET hits = hits + 1 WHERE question = ?", (key,))
+            self._db.commit()
+            self._stats["hits"] += 1
+            return {"code": row[0], "result_fingerprint": row[1]}
+
+    def put(self, question, data_hash, code, result_fingerprint):
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO queries "
+                "(question, data_hash, code, result_fingerprint, hits, created) "
+                "VALUES (?, ?, ?, ?, 0, ?)",
+                (normalize_query(question), data_hash, code, result_fingerprint, time.time()),
+            )
+            self._db.commit()
+
+    def discard(self, question):
+        with self._lock:
+            self._db.execute("DELETE FROM queries WHERE question = ?", (normalize_query(question),))
+            self._db.commit()
+
+    # ----------------- EXPLANATIONS -----------------
+    def get_explanation(self, result_fingerprint):
+        with self._lock:
+            row = self._db.execute(
+                "SELECT explanation FROM explanations WHERE result_fingerprint = ?",
+                (result_fingerprint,),
+            ).fetchone()
+            if row is None:
+                return None
+            self._db.execute(
+                "UPDATE explanations SET used = ? WHERE result_fingerprint = ?",
+                (time.time(), result_fingerprint),
+            )
+            self._db.commit()
+            self._stats["explanation_hits"] += 1
+            return row[0]
+
+    def put_explanation(self, result_fingerprint, explanation):
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO explanations (result_fingerprint, explanation, used) "
+                "VALUES (?, ?, ?)",
+                (result_fingerprint, explanation, time.time()),
+            )
+            # Keep only the most recently used explanations
+            self._db.execute(
+                "DELETE FROM explanations WHERE result_fingerprint NOT IN ("
+                "SELECT result_fingerprint FROM explanations ORDER BY used DESC LIMIT ?)",
+                (self.max_explanations,),
+            )
+            self._db.commit()
+
+    def stats(self):
+        with self._lock:
+            out = dict(self._stats)
+            lookups = out["hits"] + out["misses"]
+            out["hit_rate"] = out["hits"] / lookups if lookups else 0.0
+            out["entries"] = self._db.execute("SELECT COUNT(*) FROM queries").fetchone()[0]
+            return out
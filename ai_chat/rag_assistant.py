@@ -1,5 +1,8 @@
 # RAG assistant with defensive imports to avoid import-time failures
 import os
+import sys
+import threading
+import time
 from dotenv import load_dotenv
 
 # Attempt to import heavy AI / vector dependencies. If any import fails,
@@ -9,30 +12,29 @@ AI_AVAILABLE = False
 
 try:
     import platform
-    import pandas as pd
-    from PIL import Image
-    from pdf2image import convert_from_path
-    import pytesseract
 
     # Google Generative AI (Gemini)
     import google.generativeai as genai
 
     # Embeddings and LangChain components
-    from langchain_huggingface import HuggingFaceEmbeddings
     from langchain_text_splitters import RecursiveCharacterTextSplitter
     from langchain_community.vectorstores import Chroma
-    from langchain_community.document_loaders import PyPDFLoader
-    from langchain_core.documents import Document
+
+    from ai_chat.law_ingest import load_pdf_pages
+    from ai_chat.law_index import update_index, index_version
+    from ai_chat.answer_cache import AnswerCache
+    from ai_chat.streaming import stream_text, cached_text
+    from ai_chat.embedding_service import EmbeddingService
 
     # Load environment
     load_dotenv()
 
-    # Platform-specific binaries
+    # Platform-specific binaries (only needed for pages without a text layer)
     if platform.system() == "Windows":
-        pytesseract.pytesseract.tesseract_cmd = r"C:\Program Files\Tesseract-OCR\tesseract.exe"
+        TESSERACT_CMD = r"C:\Program Files\Tesseract-OCR\tesseract.exe"
         POPPLER_PATH = r"C:\Users\USER\Desktop\poppler-25.11.0\Library\bin"
     else:
-        pytesseract.pytesseract.tesseract_cmd = "tesseract"
+        TESSERACT_CMD = "tesseract"
         POPPLER_PATH = "/usr/bin"
 
     # Google AI API config
@@ -45,6 +47,9 @@ try:
     PDF_FOLDER = os.path.join(BASE_DIR, "../laws_pdfs")
 
     EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+    EMBEDDING_BATCH_SIZE = 64
+    CHUNK_SIZE = 800
+    CHUNK_OVERLAP = 50
 
     AI_AVAILABLE = True
 except Exception as e:
@@ -52,6 +57,141 @@ except Exception as e:
     AI_IMPORT_ERROR = str(e)
 
 
+# ----------------- SHARED RETRIEVER REGISTRY -----------------
+def _current_rss_bytes():
+    """Resident set size of this process in bytes (0 when unknown)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except Exception:
+        pass
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is reported in bytes on macOS and kilobytes elsewhere
+        return peak if sys.platform == "darwin" else peak * 1024
+    except Exception:
+        return 0
+
+
+def _persist_dir_fingerprint(path):
+    """Cheap signature of a persist directory: path, file count, size, newest mtime."""
+    if not os.path.isdir(path):
+        return (path, 0, 0, 0.0)
+    n_files, total_size, newest = 0, 0, 0.0
+    for root, _dirs, files in os.walk(path):
+        for name in files:
+            try:
+                st = os.stat(os.path.join(root, name))
+            except OSError:
+                continue
+            n_files += 1
+            total_size += st.st_size
+            newest = max(newest, st.st_mtime)
+    return (path, n_files, total_size, newest)
+
+
+FINGERPRINT_TTL_SECONDS = 30.0
+
+
+class RetrieverRegistry:
+    """Process-wide, thread-safe holder for the embedding model and vector store.
+
+    Streamlit imports this module once per server process, so every session
+    shares the same instance. The embedding model is loaded on first use and
+    kept for the life of the process; the Chroma client is reopened only when
+    the persist directory changes on disk (or `invalidate()` is called).
+
+    Changes are detected with `version_getter(persist_dir)` (a stat of the
+    index manifest). Only when it returns None, e.g. for an index built
+    without a manifest, is the directory walked, at most once per
+    `fingerprint_ttl` seconds.
+    """
+
+    def __init__(self, store_factory, embeddings_factory, persist_dir_getter,
+                 version_getter=None, fingerprint_ttl=FINGERPRINT_TTL_SECONDS):
+        self._store_factory = store_factory
+        self._embeddings_factory = embeddings_factory
+        self._persist_dir_getter = persist_dir_getter
+        self._version_getter = version_getter
+        self._fingerprint_ttl = fingerprint_ttl
+        self._lock = threading.RLock()
+        self._embeddings = None
+        self._vectordb = None
+        self._fingerprint = None
+        self._walked = None  # (persist_dir, monotonic time, fingerprint)
+        self._stats = {
+            "embeddings_load_seconds": None,
+            "embeddings_memory_bytes": None,
+            "store_load_seconds": None,
+            "store_memory_bytes": None,
+            "store_loads": 0,
+            "hits": 0,
+            "persist_directory": None,
+        }
+
+    def get_embeddings(self):
+        with self._lock:
+            if self._embeddings is None:
+                rss_before = _current_rss_bytes()
+                start = time.perf_counter()
+                self._embeddings = self._embeddings_factory()
+                self._stats["embeddings_load_seconds"] = time.perf_counter() - start
+                self._stats["embeddings_memory_bytes"] = max(_current_rss_bytes() - rss_before, 0)
+                print(f"Embeddings initialized in {self._stats['embeddings_load_seconds']:.2f}s")
+            return self._embeddings
+
+    def _version(self, persist_dir, fresh=False):
+        if self._version_getter is not None:
+            version = self._version_getter(persist_dir)
+            if version is not None:
+                return version
+        now = time.monotonic()
+        walked = self._walked
+        if not fresh and walked is not None and walked[0] == persist_dir \
+                and now - walked[1] < self._fingerprint_ttl:
+            return walked[2]
+        fingerprint = _persist_dir_fingerprint(persist_dir)
+        self._walked = (persist_dir, now, fingerprint)
+        return fingerprint
+
+    def get(self):
+        """Return the shared vector store, reloading it if the directory changed."""
+        persist_dir = self._persist_dir_getter()
+        with self._lock:
+            fingerprint = self._version(persist_dir)
+            if self._vectordb is not None and fingerprint == self._fingerprint:
+                self._stats["hits"] += 1
+                return self._vectordb
+
+            embeddings = self.get_embeddings()
+            rss_before = _current_rss_bytes()
+            start = time.perf_counter()
+            self._vectordb = self._store_factory(persist_dir, embeddings)
+            self._stats["store_load_seconds"] = time.perf_counter() - start
+            self._stats["store_memory_bytes"] = max(_current_rss_bytes() - rss_before, 0)
+            self._stats["store_loads"] += 1
+            self._stats["persist_directory"] = persist_dir
+            # Opening Chroma can touch files in the directory, so fingerprint afterwards
+            self._fingerprint = self._version(persist_dir, fresh=True)
+            print(f"Vector DB loaded in {self._stats['store_load_seconds']:.2f}s")
+            return self._vectordb
+
+    def invalidate(self):
+        """Drop the cached vector store; the embedding model is kept."""
+        with self._lock:
+            self._vectordb = None
+            self._fingerprint = None
+            self._walked = None
+
+    def stats(self):
+        with self._lock:
+            out = dict(self._stats)
+            out["embeddings_loaded"] = self._embeddings is not None
+            out["store_loaded"] = self._vectordb is not None
+            return out
+
+
 if not AI_AVAILABLE:
     def answer_question(query):
         """Fallback when RAG dependencies are missing."""
@@ -63,61 +203,98 @@ if not AI_AVAILABLE:
     def search_laws_data(query, k=5):
         return []
 
+    def stream_answer(query):
+        yield answer_question(query)
+
+    def retriever_stats():
+        return {"available": False, "error": AI_IMPORT_ERROR}
+
 else:
-    # ----------------- OCR PDF LOADER -----------------
-    def load_law_pdfs_with_ocr():
-        all_docs = []
-        pdf_files = [f for f in os.listdir(PDF_FOLDER) if f.lower().endswith(".pdf")]
-        print(f"Found {len(pdf_files)} PDFs in {PDF_FOLDER}")
-
-        for file in pdf_files:
-            pdf_path = os.path.join(PDF_FOLDER, file)
-            print(f"Processing {file}...")
-            pages = convert_from_path(pdf_path, poppler_path=POPPLER_PATH)
-
-            for i, page_image in enumerate(pages):
-                text = pytesseract.image_to_string(page_image, lang="eng")
-                if text.strip():
-                    doc = Document(
-                        page_content=text,
-                        metadata={"source": file, "page": i + 1}
-                    )
-                    all_docs.append(doc)
-            print(f"  -> Loaded {len(pages)} pages from {file}")
-
-        print(f"Total pages loaded: {len(all_docs)}")
-        return all_docs
+    retriever_registry = RetrieverRegistry(
+        store_factory=lambda path, embeddings: Chroma(
+            persist_directory=path,
+            embedding_function=embeddings
+        ),
+        embeddings_factory=lambda: EmbeddingService(
+            model_name=EMBEDDING_MODEL,
+            batch_size=EMBEDDING_BATCH_SIZE,
+            memory_probe=_current_rss_bytes,
+        ),
+        persist_dir_getter=lambda: VECTOR_DB_PATH,
+        version_getter=index_version,
+    )
+
+    answer_cache = AnswerCache(version_getter=lambda: index_version(VECTOR_DB_PATH))
+
+    def retriever_stats():
+        """Load time, memory footprint and hit counts of the shared retriever.
+
+        Includes the embedding cache hit rate once the embeddings are loaded.
+        The embedding model itself loads on the first cache miss, so its load
+        time and memory come from the embedding service.
+        """
+        stats = dict(retriever_registry.stats(), available=True)
+        if stats["embeddings_loaded"]:
+            embedding_stats = retriever_registry.get_embeddings().stats()
+            stats["embedding_cache"] = embedding_stats
+            stats["embeddings_load_seconds"] = embedding_stats["model_load_seconds"]
+            stats["embeddings_memory_bytes"] = embedding_stats["model_memory_bytes"]
+        stats["answer_cache"] = answer_cache.stats()
+        return stats
+
+    # ----------------- PDF LOADER -----------------
+    def load_law_pages(pdf_paths):
+        """Page texts for the given PDFs: {filename: [(page_number, text), ...]}.
+
+        The embedded text layer is used where it is readable; only the
+        remaining pages are rasterized and OCR'd.
+        """
+        pages, _report = load_pdf_pages(
+            pdf_paths,
+            poppler_path=POPPLER_PATH,
+            tesseract_cmd=TESSERACT_CMD,
+        )
+        return pages
 
     # ----------------- SPLITTING -----------------
+    splitter = RecursiveCharacterTextSplitter(
+        chunk_size=CHUNK_SIZE,
+        chunk_overlap=CHUNK_OVERLAP
+    )
+
     def split_documents(docs):
-        splitter = RecursiveCharacterTextSplitter(
-            chunk_size=800,
-            chunk_overlap=50
-        )
         chunks = splitter.split_documents(docs)
         print(f"Documents split into {len(chunks)} chunks")
         return chunks
 
     # ----------------- VECTOR DB -----------------
     def create_vector_db():
-        docs = load_law_pdfs_with_ocr()
-        chunks = split_documents(docs)
+        """Incrementally sync the laws index with the PDFs in PDF_FOLDER.
 
-        vectordb = Chroma.from_documents(
-            documents=chunks,
-            embedding=HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL),
-            persist_directory=VECTOR_DB_PATH
+        Only new or modified PDFs are loaded, only changed pages are
+        re-embedded, and chunks of removed PDFs are deleted.
+        """
+        vectordb = retriever_registry.get()
+        summary = update_index(
+            vectordb,
+            PDF_FOLDER,
+            VECTOR_DB_PATH,
+            load_pages=load_law_pages,
+            split_text=splitter.split_text,
+            settings={
+                "embedding_model": EMBEDDING_MODEL,
+                "normalize_embeddings": True,
+                "chunk_size": CHUNK_SIZE,
+                "chunk_overlap": CHUNK_OVERLAP,
+            },
         )
-        print("Vector DB created and saved successfully!")
-        return vectordb
+        print(f"Vector DB up to date: {summary}")
+        retriever_registry.invalidate()
+        return retriever_registry.get()
 
     def load_vector_db():
-        vectordb = Chroma(
-            persist_directory=VECTOR_DB_PATH,
-            embedding_function=HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL)
-        )
-        print("Vector DB loaded successfully!")
-        return vectordb
+        """Return the shared laws vector store (loaded once per process)."""
+        return retriever_registry.get()
 
     # ----------------- SEARCH & ANSWER -----------------
     def search_laws_data(query, k=5):
@@ -125,8 +302,28 @@ else:
         results = vectordb.similarity_search(query, k)
         return results
 
-    def answer_question(query):
-        results = search_laws_data(query)
+    def stream_answer(query):
+        """Generator of answer text pieces as Gemini produces them.
+
+        Cached answers are yielded in one piece. The full streamed answer is
+        added to the answer cache once generation completes.
+        """
+        start = time.perf_counter()
+
+        # Exact repeat of a recent question: no embedding, search or LLM call
+        cached = answer_cache.get_exact(query)
+        if cached is not None:
+            yield from cached_text(cached, "laws_assistant")
+            return
+
+        vectordb = load_vector_db()
+        query_vector = retriever_registry.get_embeddings().embed_query(query)
+        cached = answer_cache.get_similar(query_vector)
+        if cached is not None:
+            yield from cached_text(cached, "laws_assistant")
+            return
+
+        results = vectordb.similarity_search_by_vector(query_vector, k=5)
         context = "\n\n".join([r.page_content for r in results])
 
         ai_prompt = f"""
@@ -144,8 +341,15 @@ else:
         If the answer is not in the documents, say so.
         """
 
-        response = model.generate_content(ai_prompt)
-        return response.text
+        response = model.generate_content(ai_prompt, stream=True)
+        pieces = []
+        for text in stream_text(response, "laws_assistant", start):
+            pieces.append(text)
+            yield text
+        answer_cache.put(query, query_vector, "".join(pieces))
+
+    def answer_question(query):
+        return "".join(stream_answer(query))
 
 
 # ----------------- MAIN -----------------
@@ -153,16 +357,14 @@ if __name__ == "__main__":
     if not AI_AVAILABLE:
         print("RAG assistant cannot run: missing dependencies:", AI_IMPORT_ERROR)
     else:
-        if not os.path.exists(VECTOR_DB_PATH):
-            print("Creating vector database...")
-            create_vector_db()
-        else:
-            print("Vector database already exists. Loading...")
+        print("Syncing vector database with laws PDFs...")
+        create_vector_db()
 
         while True:
             query = input("\nAsk a question about Rwanda business laws (or type 'exit' to quit): ")
             if query.lower() == "exit":
                 break
-            answer = answer_question(query)
             print("\n--- AI Answer ---")
-            print(answer)
+            for piece in stream_answer(query):
+                print(piece, end="", flush=True)
+            print()
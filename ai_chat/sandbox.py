@@ -0,0 +1,293 @@
+# Time- and memory-bounded execution of LLM-generated pandas code.
+#
+# Generated code never runs in the Streamlit server process. A small pool of
+# long-lived worker processes each holds a private copy of the dataset (sent
+# once per data version) and executes every snippet against a fresh copy of
+# it, under a CPU-time limit, an address-space limit and a wall-clock
+# deadline enforced by the parent. A worker that blows a limit is killed and
+# replaced, and the caller gets a structured error instead of a hung server.
+import time
+import queue
+import signal
+import threading
+import multiprocessing as mp
+
+SANDBOX_WORKERS = 2
+WALL_TIMEOUT_SECONDS = 15
+CPU_TIMEOUT_SECONDS = 10
+MEMORY_LIMIT_MB = 1024
+MAX_RESULT_ROWS = 5000
+
+# Builtins that generated code has no business calling
+_BLOCKED_BUILTINS = {
+    "__import__", "open", "exec", "eval", "compile", "input",
+    "exit", "quit", "breakpoint", "globals", "locals", "vars",
+}
+
+
+class CpuTimeExceeded(Exception):
+    pass
+
+
+# ----------------- WORKER PROCESS -----------------
+def _vm_size_bytes():
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmSize:"):
+                    return int(line.split()[1]) * 1024
+    except Exception:
+        pass
+    return 0
+
+
+def _apply_memory_limit(memory_limit_mb):
+    """Cap the address space at what is mapped now plus `memory_limit_mb`."""
+    try:
+        import resource
+    except ImportError:
+        return  # Windows: only the wall-clock deadline applies
+    if not memory_limit_mb:
+        return
+    limit = _vm_size_bytes() + memory_limit_mb * 1024 * 1024
+    _soft, hard = resource.getrlimit(resource.RLIMIT_AS)
+    if hard != resource.RLIM_INFINITY:
+        limit = min(limit, hard)
+    resource.setrlimit(resource.RLIMIT_AS, (limit, hard))
+
+
+def _set_cpu_deadline(cpu_seconds):
+    """Raise CpuTimeExceeded once this process has used `cpu_seconds` more CPU."""
+    try:
+        import resource
+    except ImportError:
+        return
+    _soft, hard = resource.getrlimit(resource.RLIMIT_CPU)
+    if cpu_seconds is None:
+        resource.setrlimit(resource.RLIMIT_CPU, (hard, hard))
+        return
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    soft = int(usage.ru_utime + usage.ru_stime + cpu_seconds) + 1
+    if hard != resource.RLIM_INFINITY:
+        soft = min(soft, hard)
+    resource.setrlimit(resource.RLIMIT_CPU, (soft, hard))
+
+
+def _on_sigxcpu(signum, frame):
+    raise CpuTimeExceeded()
+
+
+def _execute(code, df, pd, np, max_rows):
+    """Same eval-then-exec contract the agent has always used."""
+    import builtins
+
+    safe_builtins = {k: v for k, v in vars(builtins).items() if k not in _BLOCKED_BUILTINS}
+    namespace = {"__builtins__": safe_builtins, "df": df, "pd": pd, "np": np}
+    try:
+        result = eval(code, dict(namespace), {})
+    except SyntaxError:
+        local_vars = {"df": df}
+        exec(code, dict(namespace), local_vars)
+        result = local_vars.get("result", None)
+
+    if result is not None and not isinstance(result, pd.DataFrame):
+        try:
+            result = pd.DataFrame(result)
+        except Exception:
+            pass
+    if isinstance(result, (pd.DataFrame, pd.Series)) and len(result) > max_rows:
+        result = result.head(max_rows)
+    return result
+
+
+def _worker_main(conn, memory_limit_mb):
+    import pandas as pd
+    import numpy as np
+
+    if hasattr(signal, "SIGXCPU"):
+        signal.signal(signal.SIGXCPU, _on_sigxcpu)
+    _apply_memory_limit(memory_limit_mb)
+
+    frame = None
+    while True:
+        try:
+            msg = conn.recv()
+        except (EOFError, KeyboardInterrupt):
+            break
+        kind = msg[0]
+        if kind == "stop":
+            break
+        if kind == "load":
+            frame = msg[1]
+            conn.send(("loaded",))
+            continue
+
+        _kind, code, cpu_seconds, max_rows = msg
+        start = time.perf_counter()
+        reply = {"result": None, "error": None, "error_type": None}
+        try:
+            _set_cpu_deadline(cpu_seconds)
+            reply["result"] = _execute(code, frame.copy(), pd, np, max_rows)
+        except CpuTimeExceeded:
+            reply["error"] = f"CPU time limit of {cpu_seconds}s exceeded"
+            reply["error_type"] = "timeout"
+        except MemoryError:
+            reply["error"] = f"Memory limit of {memory_limit_mb} MB exceeded"
+            reply["error_type"] = "oom"
+        except Exception as e:
+            reply["error"] = f"{type(e).__name__}: {e}"
+            reply["error_type"] = "exception"
+        finally:
+            _set_cpu_deadline(None)
+        reply["seconds"] = time.perf_counter() - start
+        # send() pickles the whole reply before writing, so a failure leaves the pipe usable
+        try:
+            conn.send(("done", reply))
+        except MemoryError:
+            conn.send(("done", {"result": None, "error": "Result too large to return",
+                                "error_type": "oom", "seconds": reply["seconds"]}))
+        except Exception as e:
+            conn.send(("done", {"result": None,
+                                "error": f"Result cannot be returned ({type(e).__name__}: {e})",
+                                "error_type": "exception", "seconds": reply["seconds"]}))
+
+
+# ----------------- PARENT SIDE -----------------
+def _describe_exit(exitcode):
+    if exitcode is not None and exitcode < 0:
+        try:
+            return f"killed by {signal.Signals(-exitcode).name}"
+        except ValueError:
+            return f"killed by signal {-exitcode}"
+    return f"exit code {exitcode}"
+
+
+class _Worker:
+    def __init__(self, ctx, memory_limit_mb):
+        self.conn, child_conn = ctx.Pipe()
+        self.process = ctx.Process(
+            target=_worker_main, args=(child_conn, memory_limit_mb), daemon=True
+        )
+        self.process.start()
+        child_conn.close()
+        self.data_version = None
+
+    def kill(self):
+        try:
+            self.process.kill()
+            self.process.join(1)
+        finally:
+            self.conn.close()
+
+    def stop(self):
+        try:
+            self.conn.send(("stop",))
+            self.process.join(2)
+        except Exception:
+            pass
+        if self.process.is_alive():
+            self.kill()
+
+
+class SandboxExecutor:
+    """Pool of worker processes that run generated code under resource limits.
+
+    `run()` always returns a dict with keys `result`, `error`, `error_type`
+    (None, "timeout", "oom", "exception" or "crashed") and `seconds`.
+    """
+
+    def __init__(self, workers=SANDBOX_WORKERS, wall_timeout=WALL_TIMEOUT_SECONDS,
+                 cpu_timeout=CPU_TIMEOUT_SECONDS, memory_limit_mb=MEMORY_LIMIT_MB,
+                 max_result_rows=MAX_RESULT_ROWS):
+        self.wall_timeout = wall_timeout
+        self.cpu_timeout = cpu_timeout
+        self.memory_limit_mb = memory_limit_mb
+        self.max_result_rows = max_result_rows
+        self._ctx = mp.get_context("spawn")
+        self._idle = queue.Queue()
+        self._lock = threading.Lock()
+        self._size = workers
+        self._started = 0
+        self._closed = False
+
+    def _checkout(self):
+        """An idle worker, or a new one while the pool is below its size.
+
+        Waits up to `wall_timeout` for a worker to come back; raises
+        queue.Empty when none does.
+        """
+        wait_until = time.perf_counter() + self.wall_timeout
+        while True:
+            with self._lock:
+                if self._closed:
+                    raise RuntimeError("SandboxExecutor is shut down")
+                if self._idle.empty() and self._started < self._size:
+                    self._started += 1
+                    return _Worker(self._ctx, self.memory_limit_mb)
+            remaining = wait_until - time.perf_counter()
+            if remaining <= 0:
+                raise queue.Empty
+            worker = self._idle.get(timeout=remaining)
+            if worker is not None:
+                return worker
+            # None: a discarded worker freed its slot; spawn the replacement
+
+    def _discard(self, worker):
+        worker.kill()
+        with self._lock:
+            self._started -= 1
+        # Wake one caller blocked in _checkout() so it can use the free slot
+        self._idle.put(None)
+
+    def _wait(self, worker, deadline):
+        remaining = max(deadline - time.perf_counter(), 0)
+        if not worker.conn.poll(remaining):
+            raise TimeoutError()
+        return worker.conn.recv()
+
+    def run(self, code, df, data_version):
+        """Execute `code` against a copy of `df` in a sandboxed worker."""
+        start = time.perf_counter()
+        try:
+            worker = self._checkout()
+        except queue.Empty:
+            return {"result": None, "error": "All sandbox workers are busy",
+                    "error_type": "timeout", "seconds": time.perf_counter() - start}
+        # The wall-clock limit covers load + run only, not the wait for a worker
+        deadline = time.perf_counter() + self.wall_timeout
+
+        try:
+            if worker.data_version != data_version:
+                worker.conn.send(("load", df))
+                self._wait(worker, deadline)
+                worker.data_version = data_version
+            worker.conn.send(("run", code, self.cpu_timeout, self.max_result_rows))
+            _kind, reply = self._wait(worker, deadline)
+        except TimeoutError:
+            self._discard(worker)
+            return {"result": None,
+                    "error": f"Wall-clock limit of {self.wall_timeout}s exceeded",
+                    "error_type": "timeout", "seconds": time.perf_counter() - start}
+        except (EOFError, OSError, BrokenPipeError):
+            # The pipe closes just before the process is reaped; wait for the real status
+            worker.process.join(1)
+            exitcode = worker.process.exitcode
+            self._discard(worker)
+            return {"result": None,
+                    "error": f"Sandbox worker died ({_describe_exit(exitcode)})",
+                    "error_type": "crashed", "seconds": time.perf_counter() - start}
+
+        self._idle.put(worker)
+        reply["seconds"] = time.perf_counter() - start
+        return reply
+
+    def shutdown(self):
+        with self._lock:
+            self._closed = True
+        while True:
+            try:
+                worker = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            if worker is not None:
+                worker.stop()
@@ -0,0 +1,70 @@
+# Streaming helpers shared by the Laws and Export assistants.
+#
+# `stream_text` turns a Gemini streaming response into a generator of text
+# pieces and records time-to-first-token (TTFT) and total generation time
+# per assistant, so the UI can render tokens as they arrive. Answers served
+# from a cache go through `cached_text` instead: they are counted as cache
+# hits and kept out of the TTFT averages, which only describe real Gemini
+# streams.
+import threading
+import time
+
+_lock = threading.Lock()
+_metrics = {}
+
+
+def _assistant_metrics(name):
+    return _metrics.setdefault(name, {
+        "streams": 0, "last_ttft_seconds": None, "avg_ttft_seconds": None,
+        "last_total_seconds": None, "cache_hits": 0,
+    })
+
+
+def record_stream_metric(name, ttft_seconds, total_seconds):
+    with _lock:
+        m = _assistant_metrics(name)
+        m["streams"] += 1
+        m["last_ttft_seconds"] = ttft_seconds
+        m["last_total_seconds"] = total_seconds
+        prev = m["avg_ttft_seconds"] or 0.0
+        m["avg_ttft_seconds"] = prev + (ttft_seconds - prev) / m["streams"]
+    print(f"[{name}] time to first token {ttft_seconds:.2f}s, total {total_seconds:.2f}s")
+
+
+def stream_text(chunks, name, start=None):
+    """Yield the text of each streamed chunk, timing the first and last one.
+
+    `chunks` is an iterable of Gemini response chunks (anything with `.text`)
+    or plain strings. `start` defaults to the moment iteration begins; pass
+    the request start time to include prompt setup in the TTFT.
+    """
+    start = start if start is not None else time.perf_counter()
+    ttft = None
+    try:
+        for chunk in chunks:
+            text = chunk if isinstance(chunk, str) else getattr(chunk, "text", "")
+            if not text:
+                continue
+            if ttft is None:
+                ttft = time.perf_counter() - start
+            yield text
+    finally:
+        total = time.perf_counter() - start
+        record_stream_metric(name, ttft if ttft is not None else total, total)
+
+
+def record_cache_hit(name):
+    with _lock:
+        _assistant_metrics(name)["cache_hits"] += 1
+
+
+def cached_text(text, name):
+    """Yield a cached answer in one piece; counted as a cache hit, not a stream."""
+    record_cache_hit(name)
+    yield text
+
+
+def streaming_stats():
+    """TTFT and total-time metrics for every assistant that has streamed."""
+    with _lock:
+        return {name: dict(m) for name, m in _metrics.items()}
@@ -1,12 +1,27 @@
+import time
+_script_start = time.perf_counter()
+
 import streamlit as st
 import pandas as pd
-import numpy as np
-import pycountry
-import plotly.express as px
-import plotly.graph_objects as go
-from io import BytesIO
 import base64
 
+from dashboard.startup import startup_profiler, lazy_import
+startup_profiler.begin(_script_start)
+
+# Only loaded when a figure is actually built (cache misses)
+px = lazy_import("plotly.express")
+
+from dashboard.data_store import load_dataset, last_load_stats, dataset_version
+from dashboard.aggregates import build_aggregates
+from dashboard.product_index import build_product_index
+from dashboard.figure_cache import FigureCache
+from dashboard.exports import EXPORT_FORMATS, filter_dataset, export_bytes, export_filename
+from dashboard.partners import PARTNER_DATA_PATH, load_partner_dataset, country_summary
+from dashboard.data_grid import (
+    DEFAULT_GRID_COLUMNS, PAGE_SIZES, search_rows, grid_positions, page_count, page_window
+)
+startup_profiler.checkpoint("import dashboard modules")
+
 
 st.set_page_config(
 
@@ -16,28 +31,101 @@ st.set_page_config(
     initial_sidebar_state="collapsed"
 )
 @st.cache_data
-def load_data():
-    return pd.read_csv("data/merged_predictions.csv")
-
-df= load_data()
+def load_data(data_version):
+    # Typed Parquet store (categoricals, int16, float32); falls back to the CSV
+    data = load_dataset()
+    stats = last_load_stats()
+    print(f"Loaded export data from {stats['source']} in {stats['seconds']:.3f}s "
+          f"({stats['memory_bytes'] / 1024:.0f} KiB)")
+    return data
+
+DATA_VERSION = dataset_version()
+df= load_data(DATA_VERSION)
+startup_profiler.checkpoint("load export data")
+
+
+@st.cache_resource
+def load_aggregates(data_version):
+    # Rollups shared by every session; rebuilt only when the data changes
+    return build_aggregates(load_data(data_version))
+
+agg = load_aggregates(DATA_VERSION)
+startup_profiler.checkpoint("build aggregates")
+
+@st.cache_resource
+def load_product_index(data_version):
+    # (Section, HS2, Year) row slices for the product tab
+    return build_product_index(load_data(data_version))
+
+product_index = load_product_index(DATA_VERSION)
+startup_profiler.checkpoint("build product index")
+
+@st.cache_resource
+def get_figure_cache():
+    # Built figures as JSON, keyed by (chart id, params, data version)
+    return FigureCache()
+
+figures = get_figure_cache()
+
+@st.cache_data(max_entries=32)
+def load_export_payload(data_version, fmt, year_range, sections, hs2):
+    # Serialized once per data version, format and filter; reruns reuse the bytes
+    frame = filter_dataset(load_data(data_version), year_range, sections, hs2)
+    return export_bytes(frame, fmt), len(frame)
+
+@st.cache_data(max_entries=64)
+def load_grid_order(data_version, year_range, sections, hs2, search, sort_by, ascending):
+    # Positions of the filtered, searched and sorted grid rows in the full dataset;
+    # reruns only slice the current page out of them
+    data = load_data(data_version)
+    rows = search_rows(filter_dataset(data, year_range, sections, hs2), search)
+    return grid_positions(data, rows, sort_by, ascending)
+
+PARTNER_VERSION = dataset_version(PARTNER_DATA_PATH)
 
 @st.cache_data
-def load_partner_states():
-    return pd.read_csv("data/data_with_coordinates_and_totalgdp.csv")
-
-data_with_coordinates_and_totalgdp = load_partner_states()
+def load_partner_states(data_version):
+    # ISO3 codes mapped once per data version; unmapped codes are reported
+    return load_partner_dataset()
 
+@st.cache_data
+def load_partner_map(data_version, year):
+    # One row per country (latest year, or the selected year) for the maps
+    return country_summary(load_partner_states(data_version)[0], year)
 
-def iso3_from_iso2(iso2):
+@st.cache_data
+def load_forecast_panel(data_version):
+    # Forecast inputs (actual exports, macro drivers) for the re-forecast panel
+    from pipeline.forecast import load_panel
+    return load_panel()
+
+@st.cache_resource
+def load_registered_models(registry_version):
+    # Saved walk-forward boosters; reloaded only when a new run is registered
+    from pipeline.model_registry import load_run
     try:
-        return pycountry.countries.get(alpha_2=iso2).alpha_3
-    except:
+        return load_run()
+    except ImportError:
+        print("xgboost is not installed; the re-forecast panel is disabled")
         return None
 
-data_with_coordinates_and_totalgdp["Country_ISO3"] = data_with_coordinates_and_totalgdp["Country_ID"].apply(iso3_from_iso2)
-
-
-data_with_coordinates_and_totalgdp["TotalGDP"] = pd.to_numeric(data_with_coordinates_and_totalgdp["TotalGDP"], errors="coerce")
+@st.cache_data(max_entries=64)
+def load_reforecast(registry_version, data_version, overrides):
+    # Recursive forecast with the saved models for one set of edited macro inputs
+    run = load_registered_models(registry_version)
+    edits = {}
+    for column, year, value in overrides:
+        edits.setdefault(column, {})[year] = value
+    start = time.perf_counter()
+    predictions = run.reforecast(load_forecast_panel(data_version), edits)
+    seconds = time.perf_counter() - start
+    return predictions[["Section", "HS2", "Year", "Data_Type", "Predicted_Exports"]], seconds
+
+@st.cache_resource
+def load_scenario_engine(registry_version, data_version):
+    # What-if projections with the saved models, cached per scenario hash
+    from pipeline.scenarios import ScenarioEngine
+    return ScenarioEngine(load_registered_models(registry_version), load_forecast_panel(data_version))
 
 st.sidebar.image(
     "assets/NISR.jpg",  # path to your image (local file in your project folder)
@@ -119,8 +207,12 @@ st.markdown(
 
 
 
-with open("assets/Rwanda tea plantation.png", "rb") as f:
-    encoded = base64.b64encode(f.read()).decode()
+@st.cache_data
+def load_background_image(path="assets/Rwanda tea plantation.png"):
+    with open(path, "rb") as f:
+        return base64.b64encode(f.read()).decode()
+
+encoded = load_background_image()
 
 
 st.markdown(
@@ -144,57 +236,65 @@ st.markdown(
 
 st.markdown("""
 <style>
-/* Whole tab bar background */
-.stTabs [role="tablist"] {
+/* Whole tab / page bar background */
+.stTabs [role="tablist"],
+.stRadio [role="radiogroup"] {
     background-color: #f5f5f5;
     padding: 5px;
     border-radius: 8px;
 }
 
 /* 1st tab: blue */
-.stTabs [role="tablist"] button:nth-of-type(1) {
+.stTabs [role="tablist"] button:nth-of-type(1),
+.stRadio [role="radiogroup"] label:nth-of-type(1) {
     background-color: #009EE0 !important; /* Rwanda blue */
     color: white !important;
     border-radius: 6px;
 }
 
 /* 2nd tab: yellow */
-.stTabs [role="tablist"] button:nth-of-type(2) {
+.stTabs [role="tablist"] button:nth-of-type(2),
+.stRadio [role="radiogroup"] label:nth-of-type(2) {
     background-color: #FCD116 !important; /* Rwanda yellow */
     color: #111 !important;
     border-radius: 6px;
 }
 
 /* 3rd tab: green */
-.stTabs [role="tablist"] button:nth-of-type(3) {
+.stTabs [role="tablist"] button:nth-of-type(3),
+.stRadio [role="radiogroup"] label:nth-of-type(3) {
     background-color: #007A33 !important; /* Rwanda green */
     color: white !important;
     border-radius: 6px;
 }
 
 /* 4th tab: light blue (variation) */
-.stTabs [role="tablist"] button:nth-of-type(4) {
+.stTabs [role="tablist"] button:nth-of-type(4),
+.stRadio [role="radiogroup"] label:nth-of-type(4) {
     background-color: #66CFFF !important;
     color: #111 !important;
     border-radius: 6px;
 }
 
 /* 5th tab: light yellow (variation) */
-.stTabs [role="tablist"] button:nth-of-type(5) {
+.stTabs [role="tablist"] button:nth-of-type(5),
+.stRadio [role="radiogroup"] label:nth-of-type(5) {
     background-color: #FFE65B !important;
     color: #111 !important;
     border-radius: 6px;
 }
 
 /* 6th tab: light green (variation) */
-.stTabs [role="tablist"] button:nth-of-type(6) {
+.stTabs [role="tablist"] button:nth-of-type(6),
+.stRadio [role="radiogroup"] label:nth-of-type(6) {
     background-color: #5AD48C !important;
     color: #111 !important;
     border-radius: 6px;
 }
             
  /* 7th tab: light blue (variation) */
-.stTabs [role="tablist"] button:nth-of-type(7) {
+.stTabs [role="tablist"] button:nth-of-type(7),
+.stRadio [role="radiogroup"] label:nth-of-type(7) {
     background-color: #66CFFF !important;
     color: #111 !important;
     border-radius: 6px;
@@ -202,7 +302,8 @@ st.markdown("""
             
 
  /* 8th tab: green (variation) */
-.stTabs [role="tablist"] button:nth-of-type(8) {
+.stTabs [role="tablist"] button:nth-of-type(8),
+.stRadio [role="radiogroup"] label:nth-of-type(8) {
     background-color: #66CFFF !important;
     color: #111 !important;
     border-radius: 6px;
@@ -213,14 +314,21 @@ st.markdown("""
 
 
             
-.stTabs [role="tablist"] button:nth-of-type(7) {
+.stTabs [role="tablist"] button:nth-of-type(7),
+.stRadio [role="radiogroup"] label:nth-of-type(7) {
     background-color: #66CFFF !important;
     color: #111 !important;
     border-radius: 6px;
 }           
 
+/* page buttons need the padding tab buttons get by default */
+.stRadio [role="radiogroup"] label {
+    padding: 4px 10px;
+}
+
 /* optional: make active tab a bit darker */
-.stTabs [role="tablist"] button[aria-selected="true"] {
+.stTabs [role="tablist"] button[aria-selected="true"],
+.stRadio [role="radiogroup"] label:has(input:checked) {
     filter: brightness(90%);
 }
             
@@ -233,7 +341,8 @@ st.markdown("""
 
 
 
-tabs= st.tabs([
+# Only the selected page runs on each rerun (st.tabs executes every tab body)
+PAGES = [
 
     "Home / Overview",
     "Export Forecasts by Product",
@@ -243,7 +352,33 @@ tabs= st.tabs([
     "Partner States GDP Map",
     "Technical Explanation",
     "Raw Data & Download"
-])
+]
+startup_profiler.checkpoint("page setup and styling")
+page = st.radio("Page", PAGES, horizontal=True, key="page", label_visibility="collapsed")
+
+
+# --- Year sliders (shared by the overview, product, indicator and opportunity pages) ---
+years_sorted = agg.years
+min_year = years_sorted[0]
+max_year = years_sorted[-1]
+if 'current_year' not in st.session_state:
+    st.session_state['current_year'] = max_year
+if 'projection_year' not in st.session_state:
+    st.session_state['projection_year'] = max_year
+
+st.session_state['current_year'] = st.sidebar.slider(
+    "Select Current Year",
+    min_year,
+    max_year,
+    value=st.session_state['current_year']
+)
+
+st.session_state['projection_year'] = st.sidebar.slider(
+    "Select Projection Year",
+    min_year,
+    max_year,
+    value=st.session_state['projection_year']
+)
 
 
 
@@ -252,7 +387,7 @@ tabs= st.tabs([
 
 
 
-with tabs[0]:
+if page == PAGES[0]:
     
     st.markdown("""
 <div style="
@@ -318,41 +453,15 @@ with tabs[0]:
 
     st.markdown("---")
 
-    total_exports= df.groupby("Year")['Predicted_Exports'].sum()
-    # Convert series to dataframe
-    total_exports_df = total_exports.reset_index()
-    total_exports_df.columns = ['Year', 'Predicted_Exports']
+    total_exports_df = agg.year_totals_frame()
 
 
 
     
-    # --- Defaults ---
-    years_sorted = sorted(df['Year'].unique())
-    min_year = int(df['Year'].min())
-    max_year = int(df['Year'].max())
-    if 'current_year' not in st.session_state:
-        st.session_state['current_year'] = max_year
-    if 'projection_year' not in st.session_state:
-        st.session_state['projection_year'] = max_year
-
-    # --- Sliders (always displayed) ---
-    st.session_state['current_year'] = st.sidebar.slider(
-        "Select Current Year",
-        min_year,
-        max_year,
-        value=st.session_state['current_year']
-    )
-
-    st.session_state['projection_year'] = st.sidebar.slider(
-        "Select Projection Year",
-        min_year,
-        max_year,
-        value=st.session_state['projection_year']
-    )
     st.info("Use the sidebar to compare exports for different years and compute growth")
     #  Compute metrics
-    total_exports_for_current_year = df[df['Year']==st.session_state['current_year']]['Predicted_Exports'].sum()
-    total_exports_for_projection_year = df[df['Year']==st.session_state['projection_year']]['Predicted_Exports'].sum()
+    total_exports_for_current_year = agg.year_total(st.session_state['current_year'])
+    total_exports_for_projection_year = agg.year_total(st.session_state['projection_year'])
 
     if total_exports_for_current_year != 0:
         growth_between_years = (total_exports_for_projection_year - total_exports_for_current_year) / total_exports_for_current_year * 100
@@ -451,46 +560,50 @@ with tabs[0]:
     </h2>
 """, unsafe_allow_html=True)
 
-    fig = px.line(
-        total_exports_df,
-        x='Year',
-        y='Predicted_Exports',
-        markers=True,
-        labels={"Predicted_Exports": "Exports (USD)", "Year": "Year"},
-        line_shape="linear",
-        text=total_exports_df["Predicted_Exports"]  # show values on points
-    )
+    def build_overview_total_exports():
+        fig = px.line(
+            total_exports_df,
+            x='Year',
+            y='Predicted_Exports',
+            markers=True,
+            labels={"Predicted_Exports": "Exports (USD)", "Year": "Year"},
+            line_shape="linear",
+            text=total_exports_df["Predicted_Exports"]  # show values on points
+        )
 
-    # Customize line, markers, and point text
-    fig.update_traces(
-        line=dict(color="#009EE0", width=3),  # Rwanda blue line
-        marker=dict(size=10, color="#007A33", line=dict(width=2, color="#00491C")),  # green points with border
-        texttemplate='%{text:,.0f}',  # display values
-        textposition='top center',
-        hovertemplate="<b>Year:</b> %{x}<br><b>Exports:</b> %{y:,.0f}<extra></extra>"
-    )
+        # Customize line, markers, and point text
+        fig.update_traces(
+            line=dict(color="#009EE0", width=3),  # Rwanda blue line
+            marker=dict(size=10, color="#007A33", line=dict(width=2, color="#00491C")),  # green points with border
+            texttemplate='%{text:,.0f}',  # display values
+            textposition='top center',
+            hovertemplate="<b>Year:</b> %{x}<br><b>Exports:</b> %{y:,.0f}<extra></extra>"
+        )
 
-    # Layout with visible axes on gray background
-    fig.update_layout(
-        yaxis=dict(
-            tickformat=',', 
-            title=dict(text="Exports (USD)", font=dict(color="#111827", size=14)),
-            tickfont=dict(color="#111827", size=12),
-            gridcolor="#E5E7EB",  
-            zerolinecolor="#111827"
-        ),
-        xaxis=dict(
-            title=dict(text="Year", font=dict(color="#111827", size=14)),
-            tickfont=dict(color="#111827", size=12),
-            gridcolor="#E5E7EB",
-            zerolinecolor="#111827",
-            dtick=1
-        ),
-        plot_bgcolor="#F9FAFB",  # chart background
-        paper_bgcolor="#F3F4F6", # dashboard background
-        font=dict(color="#111827"),
-        margin=dict(l=60, r=30, t=30, b=50)
-    )
+        # Layout with visible axes on gray background
+        fig.update_layout(
+            yaxis=dict(
+                tickformat=',', 
+                title=dict(text="Exports (USD)", font=dict(color="#111827", size=14)),
+                tickfont=dict(color="#111827", size=12),
+                gridcolor="#E5E7EB",  
+                zerolinecolor="#111827"
+            ),
+            xaxis=dict(
+                title=dict(text="Year", font=dict(color="#111827", size=14)),
+                tickfont=dict(color="#111827", size=12),
+                gridcolor="#E5E7EB",
+                zerolinecolor="#111827",
+                dtick=1
+            ),
+            plot_bgcolor="#F9FAFB",  # chart background
+            paper_bgcolor="#F3F4F6", # dashboard background
+            font=dict(color="#111827"),
+            margin=dict(l=60, r=30, t=30, b=50)
+        )
+        return fig
+
+    fig = figures.get("overview_total_exports", {}, DATA_VERSION, build_overview_total_exports)
 
     st.plotly_chart(fig, use_container_width=True)
 
@@ -505,7 +618,7 @@ with tabs[0]:
     st.markdown("---")
     st.info("Select a year to view the top 5 export products for that year")
 
-    years_opts = sorted(df['Year'].unique())
+    years_opts = agg.years
     try:
         idx = years_opts.index(int(st.session_state['year']))
     except Exception:
@@ -521,11 +634,7 @@ with tabs[0]:
 
 
     # Top 10 products for selected year
-    top_products = (
-        df[df['Year']==st.session_state['year']]
-        .sort_values(by='Predicted_Exports', ascending=False)
-        .head(10)    
-    )
+    top_products = agg.top_n(st.session_state['year'])
 
     
     st.markdown(f"""
@@ -547,35 +656,39 @@ with tabs[0]:
 
 
 
-    fig = px.bar(
-        top_products,
-        x="HS2",
-        y="Predicted_Exports",
-        text="Predicted_Exports"
-    )
+    def build_overview_top_products():
+        fig = px.bar(
+            top_products,
+            x="HS2",
+            y="Predicted_Exports",
+            text="Predicted_Exports"
+        )
 
-    fig.update_traces(
-        texttemplate='%{text:,.0f}',
-        textposition="outside"
-    )
+        fig.update_traces(
+            texttemplate='%{text:,.0f}',
+            textposition="outside"
+        )
 
-    fig.update_layout(
-        plot_bgcolor="white",   
-        paper_bgcolor="#F9FAFB", 
-        font=dict(color="#111827"),  
+        fig.update_layout(
+            plot_bgcolor="white",   
+            paper_bgcolor="#F9FAFB", 
+            font=dict(color="#111827"),  
         
-        yaxis=dict(
-            tickformat=',',
-            title="Predicted Exports (USD)",
-            title_font=dict(color="black", size=14),   # Y-axis title darker
-            tickfont=dict(color="black", size=12)      # Y-axis ticks darker
-        ),
-        xaxis=dict(
-            title="Product (HS2)",
-            title_font=dict(color="black", size=14),   # X-axis title darker
-            tickfont=dict(color="black", size=12)      # X-axis ticks darker
+            yaxis=dict(
+                tickformat=',',
+                title="Predicted Exports (USD)",
+                title_font=dict(color="black", size=14),   # Y-axis title darker
+                tickfont=dict(color="black", size=12)      # Y-axis ticks darker
+            ),
+            xaxis=dict(
+                title="Product (HS2)",
+                title_font=dict(color="black", size=14),   # X-axis title darker
+                tickfont=dict(color="black", size=12)      # X-axis ticks darker
+            )
         )
-    )
+        return fig
+
+    fig = figures.get("overview_top_products", {'year': st.session_state['year']}, DATA_VERSION, build_overview_top_products)
 
     st.plotly_chart(fig, use_container_width=True)
 
@@ -622,7 +735,7 @@ with tabs[0]:
         
 
     
-with tabs[1]:
+if page == PAGES[1]:
     if 'section' not in st.session_state:
         st.session_state['section'] = "Mineral Products"
     if 'hs2' not in st.session_state:
@@ -642,19 +755,19 @@ with tabs[1]:
     </h1>
 """, unsafe_allow_html=True)
 
-    section = st.selectbox("SELECT SECTION (FILTER)", options=df['Section'].unique())
+    section = st.selectbox("SELECT SECTION (FILTER)", options=product_index.sections)
     st.session_state['section'] = section
-    df_section = df[df['Section'] == section]
+    df_section = product_index.section(section)
 
-    product = st.selectbox("SELECT PRODUCT(HS2)", df_section["HS2"].unique())
+    product = st.selectbox("SELECT PRODUCT(HS2)", product_index.products(section))
     st.session_state['hs2'] = product
-    product_df = df_section[df_section["HS2"] == product].sort_values("Year")
+    product_df = product_index.product(section, product)
     
     current_year = st.session_state['current_year']
     projection_year = st.session_state['projection_year']
 
-    product_df_n = product_df[product_df['Year'] == current_year]['Predicted_Exports'].sum()
-    product_df_p = product_df[product_df['Year'] == projection_year]['Predicted_Exports'].sum()
+    product_df_n = product_index.product_year(section, product, current_year)['Predicted_Exports'].sum()
+    product_df_p = product_index.product_year(section, product, projection_year)['Predicted_Exports'].sum()
     if product_df_n != 0:
         perc_growth = (product_df_p - product_df_n) / product_df_n * 100
     else:
@@ -745,42 +858,46 @@ with tabs[1]:
 
     # Line chart
     # --- Line chart ---
-    fig = px.line(
-    product_df,
-    x="Year",
-    y="Predicted_Exports",
-    markers=True,
-    labels={"Predicted_Exports": "Exports (USD)"}
-)
+    def build_product_history():
+        fig = px.line(
+        product_df,
+        x="Year",
+        y="Predicted_Exports",
+        markers=True,
+        labels={"Predicted_Exports": "Exports (USD)"}
+    )
 
-    fig.update_traces(
-    line=dict(color="#009EE0", width=3),
-    marker=dict(size=8, color="#007A33", line=dict(width=2, color="#00491C")),
-    hovertemplate="<b>Year:</b> %{x}<br><b>Exports:</b> %{y:,.0f}<extra></extra>"
-)
+        fig.update_traces(
+        line=dict(color="#009EE0", width=3),
+        marker=dict(size=8, color="#007A33", line=dict(width=2, color="#00491C")),
+        hovertemplate="<b>Year:</b> %{x}<br><b>Exports:</b> %{y:,.0f}<extra></extra>"
+    )
 
-    fig.update_layout(
-    plot_bgcolor="white",      # chart background
-    paper_bgcolor="#F9FAFB",   # around chart
-    font=dict(color="#111827"),
-    yaxis=dict(
-        tickformat=',',
-        title="Exports (USD)",
-        title_font=dict(color="black", size=14),
-        tickfont=dict(color="black", size=12),
-        showgrid=False,        # remove gridlines
-        zeroline=False
-    ),
-    xaxis=dict(
-        dtick=1,
-        title="Year",
-        title_font=dict(color="black", size=14),
-        tickfont=dict(color="black", size=12),
-        showgrid=False,        # remove gridlines
-        zeroline=False
-    ),
-    margin=dict(l=60, r=30, t=30, b=50)
-)
+        fig.update_layout(
+        plot_bgcolor="white",      # chart background
+        paper_bgcolor="#F9FAFB",   # around chart
+        font=dict(color="#111827"),
+        yaxis=dict(
+            tickformat=',',
+            title="Exports (USD)",
+            title_font=dict(color="black", size=14),
+            tickfont=dict(color="black", size=12),
+            showgrid=False,        # remove gridlines
+            zeroline=False
+        ),
+        xaxis=dict(
+            dtick=1,
+            title="Year",
+            title_font=dict(color="black", size=14),
+            tickfont=dict(color="black", size=12),
+            showgrid=False,        # remove gridlines
+            zeroline=False
+        ),
+        margin=dict(l=60, r=30, t=30, b=50)
+    )
+        return fig
+
+    fig = figures.get("product_history", {'section': section, 'hs2': product}, DATA_VERSION, build_product_history)
 
     st.plotly_chart(fig, use_container_width=True)
 
@@ -803,39 +920,43 @@ with tabs[1]:
     </h2>
 """, unsafe_allow_html=True)
 
-    df_year_section = df_section[df_section['Year'] == current_year]
+    df_year_section = product_index.section_year(section, current_year)
     df_year_section = df_year_section.assign(
         Share_Percent = df_year_section['Predicted_Exports'] / df_year_section['Predicted_Exports'].sum() * 100
     )
 
-    fig_pie = px.pie(
-    df_year_section,
-    names="HS2",
-    values="Predicted_Exports",
-    title="Products' share in section exports",
-    color_discrete_sequence=["#009EE0", "#FCD116", "#007A33", "#F9A11B", "#00491C"]
-)
-
-    fig_pie.update_traces(
-        textinfo='percent',  # only percent inside slices
-        textfont=dict(color="black", size=12),
-        hovertemplate="<b>%{label}:</b> %{value:,.0f}<extra></extra>",
-        showlegend=True
+    def build_product_section_share():
+        fig_pie = px.pie(
+        df_year_section,
+        names="HS2",
+        values="Predicted_Exports",
+        title="Products' share in section exports",
+        color_discrete_sequence=["#009EE0", "#FCD116", "#007A33", "#F9A11B", "#00491C"]
     )
 
-    fig_pie.update_layout(
-        plot_bgcolor="white",
-        paper_bgcolor="#F9FAFB",
-        font=dict(color="#111827"),
-        legend=dict(
-            title="Products",
-            font=dict(color="black", size=12)
-        ),
-        title=dict(
-            font=dict(color="black", size=16)
-        ),
-        margin=dict(l=30, r=30, t=50, b=30)
-    )
+        fig_pie.update_traces(
+            textinfo='percent',  # only percent inside slices
+            textfont=dict(color="black", size=12),
+            hovertemplate="<b>%{label}:</b> %{value:,.0f}<extra></extra>",
+            showlegend=True
+        )
+
+        fig_pie.update_layout(
+            plot_bgcolor="white",
+            paper_bgcolor="#F9FAFB",
+            font=dict(color="#111827"),
+            legend=dict(
+                title="Products",
+                font=dict(color="black", size=12)
+            ),
+            title=dict(
+                font=dict(color="black", size=16)
+            ),
+            margin=dict(l=30, r=30, t=50, b=30)
+        )
+        return fig_pie
+
+    fig_pie = figures.get("product_section_share", {'section': section, 'year': current_year}, DATA_VERSION, build_product_section_share)
 
     st.plotly_chart(fig_pie, use_container_width=True)
 
@@ -855,48 +976,52 @@ with tabs[1]:
     </h2>
 """, unsafe_allow_html=True)
 
-    top5_products = df_section.groupby("HS2")['Predicted_Exports'].sum().sort_values(ascending=False).head(5).index
+    top5_products = agg.section_top_products(section)
     df_top5 = df_section[df_section['HS2'].isin(top5_products)]
 
-    fig_bar = px.bar(
-    df_top5,
-    x="Year",
-    y="Predicted_Exports",
-    color="HS2",
-    barmode="stack",
-    labels={"Predicted_Exports": "Exports (USD)", "HS2": "Product"},
-    color_discrete_sequence=["#009EE0", "#FCD116", "#007A33", "#F9A11B", "#00491C"],
-    text='Predicted_Exports'
-)
-
-    fig_bar.update_traces(
-        texttemplate='%{text:,.0f}',
-        textposition='inside'
+    def build_section_top_products():
+        fig_bar = px.bar(
+        df_top5,
+        x="Year",
+        y="Predicted_Exports",
+        color="HS2",
+        barmode="stack",
+        labels={"Predicted_Exports": "Exports (USD)", "HS2": "Product"},
+        color_discrete_sequence=["#009EE0", "#FCD116", "#007A33", "#F9A11B", "#00491C"],
+        text='Predicted_Exports'
     )
 
-    fig_bar.update_layout(
-        plot_bgcolor="white",     # chart area
-        paper_bgcolor="#F9FAFB",  # around chart
-        font=dict(color="black"),
-        yaxis=dict(
-    tickformat=',',
-    title=dict(text="Exports (USD)", font=dict(color="black", size=14)),
-    tickfont=dict(color="black", size=12, family="Arial Black"),  # makes labels darker/bolder
-    
-),
-        xaxis=dict(
-            dtick=1,
-            title=dict(text="Year", font=dict(color="black", size=14)),
-            tickfont=dict(color="black", size=12, family="Arial Black"),  # bold & dark
-
-        ),
+        fig_bar.update_traces(
+            texttemplate='%{text:,.0f}',
+            textposition='inside'
+        )
 
-                legend=dict(
-                    title="Products",
-                    font=dict(color="black", size=1)
-                ),
-                margin=dict(l=40, r=30, t=50, b=50)
-            )
+        fig_bar.update_layout(
+            plot_bgcolor="white",     # chart area
+            paper_bgcolor="#F9FAFB",  # around chart
+            font=dict(color="black"),
+            yaxis=dict(
+        tickformat=',',
+        title=dict(text="Exports (USD)", font=dict(color="black", size=14)),
+        tickfont=dict(color="black", size=12, family="Arial Black"),  # makes labels darker/bolder
+    
+    ),
+            xaxis=dict(
+                dtick=1,
+                title=dict(text="Year", font=dict(color="black", size=14)),
+                tickfont=dict(color="black", size=12, family="Arial Black"),  # bold & dark
+
+            ),
+
+                    legend=dict(
+                        title="Products",
+                        font=dict(color="black", size=1)
+                    ),
+                    margin=dict(l=40, r=30, t=50, b=50)
+                )
+        return fig_bar
+
+    fig_bar = figures.get("section_top_products", {'section': section}, DATA_VERSION, build_section_top_products)
     st.plotly_chart(fig_bar, use_container_width=True)
 
 
@@ -951,7 +1076,7 @@ with tabs[1]:
 
 
 
-with tabs[2]:
+if page == PAGES[2]:
     
     st.markdown(f"""
     <h1 style="
@@ -969,13 +1094,13 @@ with tabs[2]:
 
 
     year= st.session_state['current_year']
-    df_year = df[df['Year'] == year]
+    macro_year = agg.macro(year)
 
-    avg_gdp = df_year['GDP'].mean()
-    avg_fx = df_year['Predicted_Exchange_Rate'].mean()
-    weighted_gdp_fx = (df_year['GDP'] * df_year['Predicted_Exchange_Rate']).mean()
-    partner_weighted_gdp= df_year['WeightedGDP'].mean()
-    partner_weighted_exchange_rate= df_year['WeightedFX'].mean()
+    avg_gdp = macro_year['GDP']
+    avg_fx = macro_year['Predicted_Exchange_Rate']
+    weighted_gdp_fx = macro_year['GDP_x_FX']
+    partner_weighted_gdp= macro_year['WeightedGDP']
+    partner_weighted_exchange_rate= macro_year['WeightedFX']
 
     card_style_blue = """
     <div style="
@@ -1046,10 +1171,10 @@ with tabs[2]:
    
 
 # Example groupings
-    gdp_over_years = df.groupby("Year")["GDP"].mean().reset_index()
-    fx_over_years = df.groupby("Year")["Predicted_Exchange_Rate"].mean().reset_index()
-    weighted_fx_gdp = df.groupby("Year")["FX_x_WeightedGDP"].mean().reset_index()
-    weight_partner_weighted_gdp= df.groupby("Year")["WeightedGDP"].mean().reset_index()
+    gdp_over_years = agg.macro_series("GDP")
+    fx_over_years = agg.macro_series("Predicted_Exchange_Rate")
+    weighted_fx_gdp = agg.macro_series("FX_x_WeightedGDP")
+    weight_partner_weighted_gdp= agg.macro_series("WeightedGDP")
 
 
 # --- Rwanda GDP Over Years ---
@@ -1067,42 +1192,46 @@ with tabs[2]:
         </h1>
     """, unsafe_allow_html=True)
 
-    fig_gdp = px.line(
-        gdp_over_years,
-        x="Year",
-        y="GDP",
-        markers=True,
-        labels={"GDP": "GDP (USD)"}
-    )
+    def build_macro_gdp():
+        fig_gdp = px.line(
+            gdp_over_years,
+            x="Year",
+            y="GDP",
+            markers=True,
+            labels={"GDP": "GDP (USD)"}
+        )
 
-    fig_gdp.update_traces(
-        line=dict(color="#009EE0", width=3),
-        marker=dict(size=8, color="#007A33", line=dict(width=2, color="#00491C")),
-        hovertemplate="<b>Year:</b> %{x}<br><b>GDP:</b> %{y:,.0f}<extra></extra>"
-    )
+        fig_gdp.update_traces(
+            line=dict(color="#009EE0", width=3),
+            marker=dict(size=8, color="#007A33", line=dict(width=2, color="#00491C")),
+            hovertemplate="<b>Year:</b> %{x}<br><b>GDP:</b> %{y:,.0f}<extra></extra>"
+        )
 
-    fig_gdp.update_layout(
-        plot_bgcolor="white",
-        paper_bgcolor="#F9FAFB",
-        font=dict(color="#111827"),
-        yaxis=dict(
-            tickformat=',',
-            title="GDP (USD)",
-            title_font=dict(color="black", size=14),
-            tickfont=dict(color="black", size=12),
-            showgrid=False,
-            zeroline=False
-        ),
-        xaxis=dict(
-            dtick=1,
-            title="Year",
-            title_font=dict(color="black", size=14),
-            tickfont=dict(color="black", size=12),
-            showgrid=False,
-            zeroline=False
-        ),
-        margin=dict(l=60, r=30, t=30, b=50)
-    )
+        fig_gdp.update_layout(
+            plot_bgcolor="white",
+            paper_bgcolor="#F9FAFB",
+            font=dict(color="#111827"),
+            yaxis=dict(
+                tickformat=',',
+                title="GDP (USD)",
+                title_font=dict(color="black", size=14),
+                tickfont=dict(color="black", size=12),
+                showgrid=False,
+                zeroline=False
+            ),
+            xaxis=dict(
+                dtick=1,
+                title="Year",
+                title_font=dict(color="black", size=14),
+                tickfont=dict(color="black", size=12),
+                showgrid=False,
+                zeroline=False
+            ),
+            margin=dict(l=60, r=30, t=30, b=50)
+        )
+        return fig_gdp
+
+    fig_gdp = figures.get("macro_gdp", {}, DATA_VERSION, build_macro_gdp)
     st.plotly_chart(fig_gdp, use_container_width=True)
 
 
@@ -1121,42 +1250,46 @@ with tabs[2]:
         </h1>
     """, unsafe_allow_html=True)
 
-    fig_fx = px.line(
-        fx_over_years,
-        x="Year",
-        y="Predicted_Exchange_Rate",
-        markers=True,
-        labels={"Predicted_Exchange_Rate": "Exchange Rate (RWF/USD)"}
-    )
+    def build_macro_exchange_rate():
+        fig_fx = px.line(
+            fx_over_years,
+            x="Year",
+            y="Predicted_Exchange_Rate",
+            markers=True,
+            labels={"Predicted_Exchange_Rate": "Exchange Rate (RWF/USD)"}
+        )
 
-    fig_fx.update_traces(
-        line=dict(color="#009EE0", width=3),
-        marker=dict(size=8, color="#F97316", line=dict(width=2, color="#7C2D12")),
-        hovertemplate="<b>Year:</b> %{x}<br><b>Exchange Rate:</b> %{y:,.2f}<extra></extra>"
-    )
+        fig_fx.update_traces(
+            line=dict(color="#009EE0", width=3),
+            marker=dict(size=8, color="#F97316", line=dict(width=2, color="#7C2D12")),
+            hovertemplate="<b>Year:</b> %{x}<br><b>Exchange Rate:</b> %{y:,.2f}<extra></extra>"
+        )
 
-    fig_fx.update_layout(
-        plot_bgcolor="white",
-        paper_bgcolor="#F9FAFB",
-        font=dict(color="#111827"),
-        yaxis=dict(
-            tickformat=',',
-            title="Exchange Rate (RWF/USD)",
-            title_font=dict(color="black", size=14),
-            tickfont=dict(color="black", size=12),
-            showgrid=False,
-            zeroline=False
-        ),
-        xaxis=dict(
-            dtick=1,
-            title="Year",
-            title_font=dict(color="black", size=14),
-            tickfont=dict(color="black", size=12),
-            showgrid=False,
-            zeroline=False
-        ),
-        margin=dict(l=60, r=30, t=30, b=50)
-    )
+        fig_fx.update_layout(
+            plot_bgcolor="white",
+            paper_bgcolor="#F9FAFB",
+            font=dict(color="#111827"),
+            yaxis=dict(
+                tickformat=',',
+                title="Exchange Rate (RWF/USD)",
+                title_font=dict(color="black", size=14),
+                tickfont=dict(color="black", size=12),
+                showgrid=False,
+                zeroline=False
+            ),
+            xaxis=dict(
+                dtick=1,
+                title="Year",
+                title_font=dict(color="black", size=14),
+                tickfont=dict(color="black", size=12),
+                showgrid=False,
+                zeroline=False
+            ),
+            margin=dict(l=60, r=30, t=30, b=50)
+        )
+        return fig_fx
+
+    fig_fx = figures.get("macro_exchange_rate", {}, DATA_VERSION, build_macro_exchange_rate)
     st.plotly_chart(fig_fx, use_container_width=True)
 
 
@@ -1175,46 +1308,198 @@ with tabs[2]:
         </h1>
     """, unsafe_allow_html=True)
 
-    fig_weighted = px.line(
-        weight_partner_weighted_gdp,
-        x="Year",
-        y="WeightedGDP",
-        markers=True,
-        labels={"WeightedGDP": "Weighted GDP * FX"}
-    )
+    def build_macro_weighted_gdp():
+        fig_weighted = px.line(
+            weight_partner_weighted_gdp,
+            x="Year",
+            y="WeightedGDP",
+            markers=True,
+            labels={"WeightedGDP": "Weighted GDP * FX"}
+        )
 
-    fig_weighted.update_traces(
-        line=dict(color="#009EE0", width=3),
-        marker=dict(size=8, color="#10B981", line=dict(width=2, color="#064E3B")),
-        hovertemplate="<b>Year:</b> %{x}<br><b>Value:</b> %{y:,.0f}<extra></extra>"
-    )
+        fig_weighted.update_traces(
+            line=dict(color="#009EE0", width=3),
+            marker=dict(size=8, color="#10B981", line=dict(width=2, color="#064E3B")),
+            hovertemplate="<b>Year:</b> %{x}<br><b>Value:</b> %{y:,.0f}<extra></extra>"
+        )
 
-    fig_weighted.update_layout(
-        plot_bgcolor="white",
-        paper_bgcolor="#F9FAFB",
-        font=dict(color="#111827"),
-        yaxis=dict(
-            tickformat=',',
-            title="Weighted GDP * FX",
-            title_font=dict(color="black", size=14),
-            tickfont=dict(color="black", size=12),
-            showgrid=False,
-            zeroline=False
-        ),
-        xaxis=dict(
-            dtick=1,
-            title="Year",
-            title_font=dict(color="black", size=14),
-            tickfont=dict(color="black", size=12),
-            showgrid=False,
-            zeroline=False
-        ),
-        margin=dict(l=60, r=30, t=30, b=50)
-    )
+        fig_weighted.update_layout(
+            plot_bgcolor="white",
+            paper_bgcolor="#F9FAFB",
+            font=dict(color="#111827"),
+            yaxis=dict(
+                tickformat=',',
+                title="Weighted GDP * FX",
+                title_font=dict(color="black", size=14),
+                tickfont=dict(color="black", size=12),
+                showgrid=False,
+                zeroline=False
+            ),
+            xaxis=dict(
+                dtick=1,
+                title="Year",
+                title_font=dict(color="black", size=14),
+                tickfont=dict(color="black", size=12),
+                showgrid=False,
+                zeroline=False
+            ),
+            margin=dict(l=60, r=30, t=30, b=50)
+        )
+        return fig_weighted
+
+    fig_weighted = figures.get("macro_weighted_gdp", {}, DATA_VERSION, build_macro_weighted_gdp)
     st.plotly_chart(fig_weighted, use_container_width=True)
 
 
-with tabs[3]:
+    # --- Re-forecast with edited macro inputs ---
+    st.markdown(f"""
+        <h1 style="
+            text-align:center;
+            background-color:#2563EB;   
+            color:white;                
+            padding:15px;               
+            margin:20px 0;          
+            border-radius:8px;          
+            font-size:32px;             
+        ">
+        Re-forecast with Edited Macro Inputs
+        </h1>
+    """, unsafe_allow_html=True)
+
+    from pipeline.forecast import MACRO_COLUMNS
+    from pipeline.model_registry import registry_version
+
+    REGISTRY_VERSION = registry_version()
+    forecast_models = load_registered_models(REGISTRY_VERSION) if REGISTRY_VERSION else None
+    forecast_panel = load_forecast_panel(DATA_VERSION) if forecast_models is not None else None
+    if forecast_models is None:
+        st.info("No saved forecast models found. Run `python -m pipeline.model_registry` "
+                "to train and register them, then reload this page.")
+    elif forecast_models.missing_years(forecast_panel) or not forecast_models.matches(forecast_panel):
+        # A registry left over from before a data refresh cannot re-forecast this data;
+        # neither the re-forecast editor nor the what-if section below is rendered
+        st.info(f"The saved models ({forecast_models.run_id}) were trained on a different "
+                "version of the data, so re-forecasting and what-if scenarios are disabled. "
+                "Retrain them with `python -m pipeline.model_registry`, then reload this page.")
+    else:
+        base_inputs = (
+            forecast_panel[forecast_panel["Data_Type"] == "Forecast"]
+            .groupby("Year")[MACRO_COLUMNS].first()
+        )
+        st.caption("Edit the macro drivers of the forecast years; exports are re-predicted "
+                   "with the saved models instead of retraining.")
+        data_editor = getattr(st, "data_editor", None) or st.experimental_data_editor
+        edited_inputs = data_editor(base_inputs, key="reforecast_inputs", use_container_width=True)
+
+        edited_inputs = edited_inputs.astype("float64")
+        changed = (edited_inputs - base_inputs).abs() > 1e-9 * base_inputs.abs()
+        overrides = tuple(
+            (column, int(year), float(edited_inputs.at[year, column]))
+            for column in MACRO_COLUMNS for year in base_inputs.index[changed[column].to_numpy()]
+        )
+
+        baseline, _ = load_reforecast(REGISTRY_VERSION, DATA_VERSION, ())
+        edited, reforecast_seconds = load_reforecast(REGISTRY_VERSION, DATA_VERSION, overrides)
+        totals = pd.DataFrame({
+            "Baseline": baseline.groupby("Year")["Predicted_Exports"].sum(),
+            "Edited inputs": edited.groupby("Year")["Predicted_Exports"].sum(),
+        }).rename_axis("Year").reset_index()
+        totals["Change (%)"] = (totals["Edited inputs"] / totals["Baseline"] - 1) * 100
+
+        fig_reforecast = px.line(
+            totals.melt(id_vars="Year", value_vars=["Baseline", "Edited inputs"],
+                        var_name="Inputs", value_name="Total Exports (USD)"),
+            x="Year", y="Total Exports (USD)", color="Inputs", markers=True,
+            color_discrete_map={"Baseline": "#009EE0", "Edited inputs": "#F97316"},
+        )
+        fig_reforecast.update_layout(
+            plot_bgcolor="white",
+            paper_bgcolor="#F9FAFB",
+            font=dict(color="#111827"),
+            yaxis=dict(tickformat=",", showgrid=False, zeroline=False),
+            xaxis=dict(dtick=1, showgrid=False, zeroline=False),
+            margin=dict(l=60, r=30, t=30, b=50)
+        )
+        st.plotly_chart(fig_reforecast, use_container_width=True)
+        st.dataframe(
+            totals[totals["Year"].isin(base_inputs.index)].style.format(
+                {"Baseline": "{:,.0f}", "Edited inputs": "{:,.0f}", "Change (%)": "{:+.2f}"}
+            ),
+            use_container_width=True,
+        )
+        st.caption(f"{len(overrides)} edited value(s); re-forecast with run "
+                   f"{forecast_models.run_id} in {reforecast_seconds * 1000:.0f} ms.")
+
+        # --- What-if scenario ---
+        st.markdown(f"""
+            <h1 style="
+                text-align:center;
+                background-color:#2563EB;   
+                color:white;                
+                padding:15px;               
+                margin:20px 0;          
+                border-radius:8px;          
+                font-size:32px;             
+            ">
+            What-if Scenario
+            </h1>
+        """, unsafe_allow_html=True)
+
+        from pipeline.scenarios import SCENARIO_DRIVERS, shocks_from_percent
+
+        scenario_engine = load_scenario_engine(REGISTRY_VERSION, DATA_VERSION)
+        st.caption("Shift the macro drivers by a percentage from the chosen year on; "
+                   "every product is re-projected with the saved models.")
+        shock_from_year = st.selectbox(
+            "Apply shocks from", scenario_engine.forecast_years, key="whatif_from_year"
+        )
+        slider_cols = st.columns(len(SCENARIO_DRIVERS))
+        changes = {}
+        for slider_col, (column, label) in zip(slider_cols, SCENARIO_DRIVERS.items()):
+            with slider_col:
+                changes[column] = st.slider(
+                    f"{label} (%)", min_value=-30, max_value=30, value=0, step=1,
+                    key=f"whatif_{column}"
+                )
+        shocks = shocks_from_percent(changes)
+
+        scenario_totals = scenario_engine.compare_totals(shocks, shock_from_year)
+        fig_scenario = px.line(
+            scenario_totals.melt(id_vars="Year", value_vars=["Baseline", "Scenario"],
+                                 var_name="Projection", value_name="Total Exports (USD)"),
+            x="Year", y="Total Exports (USD)", color="Projection", markers=True,
+            color_discrete_map={"Baseline": "#009EE0", "Scenario": "#007A33"},
+        )
+        fig_scenario.update_layout(
+            plot_bgcolor="white",
+            paper_bgcolor="#F9FAFB",
+            font=dict(color="#111827"),
+            yaxis=dict(tickformat=",", showgrid=False, zeroline=False),
+            xaxis=dict(dtick=1, showgrid=False, zeroline=False),
+            margin=dict(l=60, r=30, t=30, b=50)
+        )
+        st.plotly_chart(fig_scenario, use_container_width=True)
+
+        impact_year = st.session_state['projection_year']
+        if impact_year not in scenario_engine.forecast_years:
+            impact_year = scenario_engine.forecast_years[-1]
+        scenario_year_total = scenario_totals.loc[scenario_totals["Year"] == impact_year].iloc[0]
+        st.metric(
+            f"Total exports in {impact_year} under this scenario",
+            f"${scenario_year_total['Scenario']:,.0f}",
+            f"{scenario_year_total['Change (%)']:+.2f}% vs baseline",
+        )
+        st.markdown(f"**Products most affected in {impact_year}**")
+        st.dataframe(
+            scenario_engine.compare_products(shocks, impact_year, shock_from_year).head(10).style.format(
+                {"Baseline": "{:,.0f}", "Scenario": "{:,.0f}", "Change (USD)": "{:+,.0f}",
+                 "Change (%)": "{:+.2f}"}
+            ),
+            use_container_width=True,
+        )
+
+
+if page == PAGES[3]:
     
     st.markdown(f"""
     <h1 style="
@@ -1232,13 +1517,12 @@ with tabs[3]:
 
 
     year = st.session_state['current_year']
-    df_year = df[df['Year'] == year]
 
    
-    top10 = df_year.sort_values(by="Predicted_Exports", ascending=False).head(10)
+    top10 = agg.top_n(year)
 
     # Metrics
-    total_exports = df_year['Predicted_Exports'].sum()
+    total_exports = agg.year_total(year)
     if not top10.empty:
         top_commodity = top10.iloc[0]
         top_commodity1 = top_commodity.get('HS2', '')
@@ -1252,7 +1536,7 @@ with tabs[3]:
     prev_year = year - 1
     prev_year_exports = 0
     if top_commodity is not None:
-        prev_year_exports = df[(df['Year'] == prev_year) & (df['HS2'] == top_commodity['HS2'])]['Predicted_Exports'].sum()
+        prev_year_exports = agg.hs2_total(top_commodity['HS2'], prev_year)
 
     if prev_year_exports != 0:
         growth_top_commodity = ((top_commodity_exports - prev_year_exports) / prev_year_exports * 100)
@@ -1340,19 +1624,23 @@ with tabs[3]:
     </h1>
 """, unsafe_allow_html=True)
 
-    fig_bar = px.bar(
-        top10,
-        x="HS2",
-        y="Predicted_Exports",
-        color="Section",
-        labels={"Predicted_Exports":"Exports (USD)", "HS2":"Product"},
-        text="Predicted_Exports"
-    )
-    fig_bar.update_traces(texttemplate='%{text:,.0f}', textposition='outside')
-    fig_bar.update_layout(
-        yaxis=dict(tickformat=','),
-        xaxis=dict(tickangle=-45)
-    )
+    def build_opportunities_top10():
+        fig_bar = px.bar(
+            top10,
+            x="HS2",
+            y="Predicted_Exports",
+            color="Section",
+            labels={"Predicted_Exports":"Exports (USD)", "HS2":"Product"},
+            text="Predicted_Exports"
+        )
+        fig_bar.update_traces(texttemplate='%{text:,.0f}', textposition='outside')
+        fig_bar.update_layout(
+            yaxis=dict(tickformat=','),
+            xaxis=dict(tickangle=-45)
+        )
+        return fig_bar
+
+    fig_bar = figures.get("opportunities_top10", {'year': year}, DATA_VERSION, build_opportunities_top10)
     st.plotly_chart(fig_bar, use_container_width=True)
 
 
@@ -1456,6 +1744,42 @@ with st.sidebar:
 
 
 
+    laws_answer_box = """
+    <div style="
+        background-color:#e8f5e9;
+        padding:15px;
+        border-radius:10px;
+        border:1px solid #c8e6c9;
+        margin-top:10px;
+        color: #1b5e20;
+    ">
+        {text}
+    </div>
+    """
+
+    export_answer_box = """
+    <div style="
+        background-color:#fff3e0;
+        padding:15px;
+        border-radius:10px;
+        border:1px solid #ffe0b2;
+        margin-top:10px;
+        color: #bf360c;
+    ">
+        {text}
+    </div>
+    """
+
+    def render_stream(pieces, box):
+        """Render streamed text into one placeholder as pieces arrive."""
+        placeholder = st.empty()
+        text = ""
+        for piece in pieces:
+            text += piece
+            placeholder.markdown(box.format(text=text + " ▌"), unsafe_allow_html=True)
+        placeholder.markdown(box.format(text=text), unsafe_allow_html=True)
+        return text
+
     def render_ai_tab():
         st.markdown("""
         <h1 style="
@@ -1512,30 +1836,18 @@ with st.sidebar:
                 # Lazy import to avoid hard failures when optional AI deps are missing
                 _err = None
                 try:
-                    from ai_chat.rag_assistant import answer_question as _answer_question
+                    from ai_chat.rag_assistant import stream_answer as _stream_answer
                 except Exception as e:
-                    _answer_question = None
+                    _stream_answer = None
                     _err = str(e)
 
-                if _answer_question is None:
+                if _stream_answer is None:
                     st.error("Laws Assistant unavailable (missing dependencies).")
                     if _err:
                         st.caption(_err)
                 else:
                     with st.spinner("Analyzing laws…"):
-                        response = _answer_question(laws_query)
-                    st.markdown(f"""
-                    <div style="
-                        background-color:#e8f5e9;
-                        padding:15px;
-                        border-radius:10px;
-                        border:1px solid #c8e6c9;
-                        margin-top:10px;
-                        color: #1b5e20;
-                    ">
-                        {response}
-                    </div>
-                    """, unsafe_allow_html=True)
+                        render_stream(_stream_answer(laws_query), laws_answer_box)
 
         # -------------------- Pandas Agent --------------------
         with export_tab:
@@ -1558,6 +1870,7 @@ with st.sidebar:
                 _err = None
                 try:
                     from ai_chat.pandas_agent import ask_pandas_agent as _ask_pandas_agent
+                    from ai_chat.pandas_agent import stream_explanation as _stream_explanation
                 except Exception as e:
                     _ask_pandas_agent = None
                     _err = str(e)
@@ -1568,7 +1881,7 @@ with st.sidebar:
                         st.caption(_err)
                 else:
                     with st.spinner("Thinking with pandas…"):
-                        result = _ask_pandas_agent(data_query)
+                        result = _ask_pandas_agent(data_query, explain=False, df=df)
 
                     if isinstance(result, dict):
                         st.markdown("**Generated Query:**")
@@ -1578,18 +1891,12 @@ with st.sidebar:
                         st.dataframe(result.get("result"))
 
                         st.markdown("**Explanation / Advice:**")
-                        st.markdown(f"""
-                        <div style="
-                            background-color:#fff3e0;
-                            padding:15px;
-                            border-radius:10px;
-                            border:1px solid #ffe0b2;
-                            margin-top:10px;
-                            color: #bf360c;
-                        ">
-                            {result.get('explanation', 'No explanation generated.')}
-                        </div>
-                        """, unsafe_allow_html=True)
+                        if result.get("result") is not None:
+                            render_stream(_stream_explanation(result["result"]), export_answer_box)
+                        else:
+                            st.markdown(export_answer_box.format(
+                                text=result.get('error') or 'No explanation generated.'
+                            ), unsafe_allow_html=True)
                     else:
                         st.error("Could not generate a result.")
 
@@ -1597,14 +1904,14 @@ with st.sidebar:
 
 
 # Render AI tab inside tab 4
-with tabs[4]:
+if page == PAGES[4]:
     render_ai_tab()
 
 
 
 
 
-with tabs[5]:
+if page == PAGES[5]:
     st.markdown("""
     <h2 style="
         text-align:center;
@@ -1619,62 +1926,91 @@ with tabs[5]:
     </h2>
     """, unsafe_allow_html=True)
 
+    data_with_coordinates_and_totalgdp, partner_report = load_partner_states(PARTNER_VERSION)
+
     st.info('This is map of partner countries, the size of the bubble depends on the size of  the total GDP of that country from 2018 up to 2030, You can hover over the bubbles to see the country, their GDP and population')
+    if partner_report["unmapped_codes"]:
+        st.warning(
+            f"{partner_report['unmapped_rows']} rows are missing from the GDP map because their country code "
+            f"could not be mapped to ISO3: {', '.join(partner_report['unmapped_codes'])}"
+        )
+
+    partner_years = sorted(data_with_coordinates_and_totalgdp["Year"].unique().tolist())
+    map_year = st.selectbox(
+        "Year (latest available per country when not set)",
+        ["Latest"] + partner_years,
+        key="partner_map_year"
+    )
+    map_year = None if map_year == "Latest" else int(map_year)
+    partner_map = load_partner_map(PARTNER_VERSION, map_year)
+    # Whole-period total GDP by default; that year's GDP when a year is picked
+    map_value = "TotalGDP" if map_year is None else "GDP"
 
     # Bubble Map
-    fig_bubble = px.scatter_geo(
-    data_with_coordinates_and_totalgdp,
-    lat='latitude',
-    lon='longitude',
-    size='TotalGDP',
-    color='TotalGDP',
-    color_continuous_scale=["#007A33", "#FCD116", "#009EE0"],  # Rwanda flag colors
-    projection='natural earth',
-    hover_name='Country',  # only show name on hover
-    hover_data={'TotalGDP': ':,', 'GDP': ':,', 'population': True}
-)
+    def build_partner_bubble_map():
+        fig_bubble = px.scatter_geo(
+        partner_map,
+        lat='latitude',
+        lon='longitude',
+        size=map_value,
+        color=map_value,
+        color_continuous_scale=["#007A33", "#FCD116", "#009EE0"],  # Rwanda flag colors
+        projection='natural earth',
+        hover_name='Country',  # only show name on hover
+        hover_data={'TotalGDP': ':,', 'GDP': ':,', 'population': True, 'Year': True}
+    )
 
-# Remove text labels on bubbles
-    fig_bubble.update_traces(text=None)
+        # Remove text labels on bubbles
+        fig_bubble.update_traces(text=None)
 
-    fig_bubble.update_layout(
-        geo=dict(showframe=False, showcoastlines=True, projection_type='natural earth'),
-        plot_bgcolor='#F9FAFB',
-        paper_bgcolor='#F3F4F6',
-        font=dict(color="#111827"),
-        margin=dict(l=0, r=0, t=0, b=0)
-    )
+        fig_bubble.update_layout(
+            geo=dict(showframe=False, showcoastlines=True, projection_type='natural earth'),
+            plot_bgcolor='#F9FAFB',
+            paper_bgcolor='#F3F4F6',
+            font=dict(color="#111827"),
+            margin=dict(l=0, r=0, t=0, b=0)
+        )
+        return fig_bubble
+
+    fig_bubble = figures.get("partner_bubble_map", {'year': map_year}, PARTNER_VERSION, build_partner_bubble_map)
     st.plotly_chart(fig_bubble, use_container_width=True)
 
 
 
-    fig_choropleth = px.choropleth(
-    data_with_coordinates_and_totalgdp,
-    locations="Country_ISO3",
-    color="TotalGDP",
-    hover_name="Country",
-    hover_data={"GDP":":,", "population":True},
-    color_continuous_scale=[
-        "#006837",  # dark green
-        "#FCD116",  # yellow
-        "#F97316",  # orange
-        "#DC2626",  # red
-        "#7E22CE",  # purple
-        "#2563EB"   # blue
-    ],
-    projection="natural earth"
-)
+    def build_partner_choropleth():
+        fig_choropleth = px.choropleth(
+        partner_map,
+        locations="Country_ISO3",
+        color=map_value,
+        hover_name="Country",
+        hover_data={"GDP":":,", "population":True, "Year":True},
+        color_continuous_scale=[
+            "#006837",  # dark green
+            "#FCD116",  # yellow
+            "#F97316",  # orange
+            "#DC2626",  # red
+            "#7E22CE",  # purple
+            "#2563EB"   # blue
+        ],
+        projection="natural earth"
+    )
 
-    fig_choropleth.update_layout(
-        geo=dict(showframe=False, showcoastlines=True, projection_type='natural earth'),
-        title=dict(text="Partner States Total GDP (2028–2030)", x=0.5, xanchor='center'),
-        margin=dict(l=0, r=0, t=0, b=0),
-        font=dict(color="#111827"),
-        coloraxis_colorbar=dict(
-            title="Total GDP",
-            tickformat=","
+        fig_choropleth.update_layout(
+            geo=dict(showframe=False, showcoastlines=True, projection_type='natural earth'),
+            title=dict(
+                text="Partner States Total GDP (2028–2030)" if map_year is None else f"Partner States GDP ({map_year})",
+                x=0.5, xanchor='center'
+            ),
+            margin=dict(l=0, r=0, t=0, b=0),
+            font=dict(color="#111827"),
+            coloraxis_colorbar=dict(
+                title="Total GDP" if map_year is None else "GDP",
+                tickformat=","
+            )
         )
-    )
+        return fig_choropleth
+
+    fig_choropleth = figures.get("partner_choropleth", {'year': map_year}, PARTNER_VERSION, build_partner_choropleth)
 
     st.plotly_chart(fig_choropleth, use_container_width=True)
 
@@ -1682,7 +2018,7 @@ with tabs[5]:
 
 
 
-with tabs[6]:  # Technical / Methodology Tab
+if page == PAGES[6]:  # Technical / Methodology Tab
 
     st.markdown(f"""
     <h1 style="
@@ -1788,17 +2124,18 @@ with tabs[6]:  # Technical / Methodology Tab
 
 
     st.code("""
-    # Creating lag, moving average and growth features
-    df_all['Revenue_Lag1'] = df_all.groupby('HS2')['Predicted_Exports'].shift(1)
-
-    df_all['Revenue_MA3'] = (
-        df_all.groupby('HS2')['Predicted_Exports']
-            .transform(lambda x: x.rolling(3, min_periods=1).mean())
-    )
-
-    df_all['Revenue_Growth'] = (
-        df_all.groupby('HS2')['Predicted_Exports'].pct_change()
-    )
+    # Creating lag, moving average and growth features (pipeline/features.py)
+    from pipeline.features import FeatureEngine, FEATURES
+
+    # Sorted once by (HS2, Year); lags, rolling means/stds and growth rates
+    # are computed from shifted arrays within each product
+    engine = FeatureEngine(df_all)
+    engine.compute_all()
+
+    # In the walk-forward loop only the forecast year's rows are refreshed
+    engine.update_year(year)
+    X_pred = engine.features_for_year(year)
+    engine.set_predictions(year, model.predict(X_pred))
     """)
 
 
@@ -1940,7 +2277,7 @@ with tabs[6]:  # Technical / Methodology Tab
 
 
        
-with tabs[7]:
+if page == PAGES[7]:
 
 
     st.markdown(f"""
@@ -1957,14 +2294,62 @@ with tabs[7]:
     </h1>
 """, unsafe_allow_html=True)
 
-    st.dataframe(df)
+    col1, col2 = st.columns(2)
+    with col1:
+        export_years = st.slider(
+            "Years",
+            min_year,
+            max_year,
+            value=(min_year, max_year),
+            key="export_years"
+        )
+        export_sections = st.multiselect("Sections (all when empty)", product_index.sections, key="export_sections")
+    with col2:
+        hs2_options = (
+            [hs2 for section in export_sections for hs2 in product_index.products(section)]
+            if export_sections else sorted(agg.hs2_year.index.get_level_values("HS2").unique())
+        )
+        export_hs2 = st.multiselect("Products (HS2, all when empty)", hs2_options, key="export_hs2")
+        export_format = st.selectbox("Format", list(EXPORT_FORMATS), key="export_format")
+
+    export_filter = (tuple(export_years), tuple(export_sections), tuple(export_hs2))
+
+    # --- Paged table: only the visible rows and columns go to the browser ---
+    grid_columns = st.multiselect(
+        "Columns", list(df.columns), default=DEFAULT_GRID_COLUMNS, key="grid_columns"
+    )
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        grid_search = st.text_input("Search product / section", key="grid_search")
+    with col2:
+        grid_sort = st.selectbox("Sort by", ["(none)"] + list(df.columns), key="grid_sort")
+    with col3:
+        grid_ascending = st.checkbox("Ascending", value=True, key="grid_ascending")
+    with col4:
+        grid_page_size = st.selectbox("Rows per page", PAGE_SIZES, key="grid_page_size")
+
+    grid_order = load_grid_order(
+        DATA_VERSION, *export_filter, grid_search,
+        None if grid_sort == "(none)" else grid_sort, grid_ascending
+    )
+    n_pages = page_count(len(grid_order), grid_page_size)
+    if st.session_state.get("grid_page", 1) > n_pages:
+        st.session_state["grid_page"] = n_pages  # the filter shrank the result
+    grid_page = int(st.number_input("Page", min_value=1, max_value=n_pages, step=1, key="grid_page"))
+
+    first_row = (grid_page - 1) * grid_page_size
+    st.caption(
+        f"Rows {min(first_row + 1, len(grid_order)):,}–{min(first_row + grid_page_size, len(grid_order)):,} "
+        f"of {len(grid_order):,} (page {grid_page} of {n_pages})"
+    )
+    st.dataframe(page_window(df, grid_order, grid_page, grid_page_size, grid_columns))
 
-    csv = df.to_csv(index=False).encode("utf-8")
+    payload, n_rows = load_export_payload(DATA_VERSION, export_format, *export_filter)
     st.download_button(
-        label="Download CSV",
-        data=csv,
-        file_name="rwanda_exports_predictions.csv",
-        mime="text/csv",
+        label=f"Download {export_format} ({n_rows:,} rows)",
+        data=payload,
+        file_name=export_filename(export_format, export_years),
+        mime=EXPORT_FORMATS[export_format]["mime"],
     )
 
 
@@ -1973,4 +2358,8 @@ with tabs[7]:
 
 
 
-   
\ No newline at end of file
+   
+
+
+startup_profiler.checkpoint(f"render page: {page}")
+startup_profiler.finish("Startup profile (first run)")
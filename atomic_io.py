@@ -0,0 +1,25 @@
+# Atomic file writes shared by the ingest checkpoints, the laws index
+# manifest and the model registry.
+#
+# The text goes to a uniquely named temp file in the target's directory and
+# is then renamed over the target with os.replace, so readers see either the
+# old file or the complete new one, never a partial write. If anything fails
+# before the rename the temp file is removed and the error is re-raised.
+import os
+import tempfile
+
+
+def write_text_atomic(path, text, encoding="utf-8"):
+    """Atomically replace `path` with `text` (temp file in the same directory + rename)."""
+    directory, name = os.path.split(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix=name + ".", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, "w", encoding=encoding) as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
@@ -0,0 +1,87 @@
+# Precomputed rollups of the export predictions for the dashboard tabs.
+#
+# Every rerun of app.py used to regroup and rescan the full frame for each
+# chart and metric card. `build_aggregates()` computes all of those rollups
+# once per data version; the tabs then read them with dictionary / index
+# lookups.
+import pandas as pd
+
+TOP_N = 10
+SECTION_TOP_N = 5
+MACRO_COLUMNS = ["GDP", "Predicted_Exchange_Rate", "WeightedGDP", "WeightedFX", "FX_x_WeightedGDP"]
+TOP_COLUMNS = ["Section", "HS2", "Year", "Share (%)", "TotalExportsYear", "Predicted_Exports"]
+
+
+class Aggregates:
+    """Read-only rollups of one version of the export dataset."""
+
+    def __init__(self, df, top_n=TOP_N, section_top_n=SECTION_TOP_N):
+        exports = df["Predicted_Exports"]
+
+        # Year totals: Year -> total predicted exports
+        self.year_totals = exports.groupby(df["Year"]).sum().sort_index()
+
+        # Section x Year and HS2 x Year sums
+        self.section_year = (
+            df.groupby(["Section", "Year"], observed=True)["Predicted_Exports"].sum()
+        )
+        self.hs2_year = (
+            df.groupby(["HS2", "Year"], observed=True)["Predicted_Exports"].sum()
+        )
+
+        # Year shares: each product's share (%) of its year's total
+        self.year_shares = (
+            self.hs2_year / self.hs2_year.index.get_level_values("Year").map(self.year_totals) * 100
+        )
+
+        # Top-N products per year
+        ranked = df.sort_values(["Year", "Predicted_Exports"], ascending=[True, False])
+        top_cols = [c for c in TOP_COLUMNS if c in df.columns]
+        self._top_n = {
+            int(year): group[top_cols].head(top_n)
+            for year, group in ranked.groupby("Year", sort=True)
+        }
+
+        # Top products of each section by total over all years
+        hs2_totals = df.groupby(["Section", "HS2"], observed=True)["Predicted_Exports"].sum()
+        self._section_top = {
+            section: list(group.sort_values(ascending=False).head(section_top_n)
+                          .index.get_level_values("HS2"))
+            for section, group in hs2_totals.groupby(level="Section", observed=True)
+        }
+
+        # Macro means per year (plus the mean of GDP x FX shown on the cards)
+        macro = df.groupby("Year")[MACRO_COLUMNS].mean()
+        macro["GDP_x_FX"] = (df["GDP"] * df["Predicted_Exchange_Rate"]).groupby(df["Year"]).mean()
+        self.macro_means = macro.sort_index()
+
+        self.years = [int(y) for y in self.year_totals.index]
+
+    # ----------------- LOOKUPS -----------------
+    def year_total(self, year):
+        return float(self.year_totals.get(year, 0.0))
+
+    def year_totals_frame(self):
+        return self.year_totals.rename("Predicted_Exports").reset_index()
+
+    def hs2_total(self, hs2, year):
+        return float(self.hs2_year.get((hs2, year), 0.0))
+
+    def top_n(self, year):
+        return self._top_n.get(int(year), pd.DataFrame(columns=TOP_COLUMNS))
+
+    def section_top_products(self, section):
+        return self._section_top.get(section, [])
+
+    def macro(self, year):
+        """Macro means for one year as a Series (NaN when the year is unknown)."""
+        if year in self.macro_means.index:
+            return self.macro_means.loc[year]
+        return pd.Series(index=self.macro_means.columns, dtype="float64")
+
+    def macro_series(self, column):
+        return self.macro_means[column].reset_index()
+
+
+def build_aggregates(df, top_n=TOP_N):
+    return Aggregates(df, top_n=top_n)
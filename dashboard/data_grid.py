@@ -0,0 +1,56 @@
+# Server-side paging for the raw data table.
+#
+# The browser only receives one page of the selected columns. Search and
+# sort run here on the server: `search_rows()` filters by product / section
+# text, `sorted_positions()` gives the row order for a sort column and
+# `grid_positions()` maps that order back onto the full dataset (app.py
+# caches it per data version, filter, search and sort), so `page_window()`
+# cuts the visible rows straight out of the full frame on every rerun.
+import math
+
+import numpy as np
+
+DEFAULT_GRID_COLUMNS = [
+    "Year", "Section", "HS2", "Data_Type", "Predicted_Exports", "Share (%)", "TotalExportsYear",
+]
+PAGE_SIZES = [25, 50, 100, 250]
+SEARCH_COLUMNS = ["HS2", "Section"]
+
+
+def search_rows(df, text, columns=SEARCH_COLUMNS):
+    """Rows whose product or section name contains `text` (case-insensitive)."""
+    text = (text or "").strip()
+    if not text:
+        return df
+    mask = np.zeros(len(df), dtype=bool)
+    for col in columns:
+        if col in df.columns:
+            mask |= df[col].astype(str).str.contains(text, case=False, regex=False).to_numpy()
+    return df[mask]
+
+
+def sorted_positions(df, sort_by=None, ascending=True):
+    """Row positions of `df` in display order (stable, missing values last)."""
+    if not sort_by or sort_by not in df.columns:
+        return np.arange(len(df))
+    values = df[sort_by].reset_index(drop=True)
+    return values.sort_values(ascending=ascending, kind="stable", na_position="last").index.to_numpy()
+
+
+def grid_positions(df, rows, sort_by=None, ascending=True):
+    """Positions in `df` of the subset `rows` (a filter of `df`), in display order."""
+    return df.index.get_indexer(rows.index)[sorted_positions(rows, sort_by, ascending)]
+
+
+def page_count(n_rows, page_size):
+    return max(1, math.ceil(n_rows / page_size))
+
+
+def page_window(df, positions, page, page_size, columns=None):
+    """The rows of 1-based `page`, restricted to `columns`."""
+    page = min(max(int(page), 1), page_count(len(positions), page_size))
+    start = (page - 1) * page_size
+    window = df.iloc[positions[start:start + page_size]]
+    if columns:
+        window = window[[c for c in columns if c in df.columns]]
+    return window
@@ -0,0 +1,118 @@
+# Typed columnar store for the export predictions dataset.
+#
+# `build_dataset()` converts data/merged_predictions.csv into a Parquet file
+# with compact dtypes (categoricals for labels, int16 for years and IDs,
+# float32 for rates and ratios) and without the two junk index columns.
+# `load_dataset()` reads that file with optional column projection, falls
+# back to the CSV (typed the same way) when Parquet is missing, stale or
+# unreadable, and reports how long the load took and how much memory the
+# frame uses.
+import os
+import time
+
+import pandas as pd
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CSV_PATH = os.path.join(BASE_DIR, "data", "merged_predictions.csv")
+PARQUET_PATH = os.path.join(BASE_DIR, "data", "merged_predictions.parquet")
+
+DROP_COLUMNS = ["Unnamed: 0.1", "Unnamed: 0"]
+CATEGORY_COLUMNS = ["Section", "HS2", "Data_Type"]
+INT16_COLUMNS = ["Year", "Section ID", "HS2 ID"]
+
+# Rates, ratios and growth features: float32 keeps ~7 significant digits,
+# plenty for these. Money and GDP levels (up to ~1e15) stay float64 so
+# dollar totals shown on the dashboard do not change.
+FLOAT32_COLUMNS = [
+    "Share (%)", "WeightedFX", "Predicted_Exchange_Rate", "Revenue_Growth",
+    "FX_Lag1", "FX_Lag2", "FX_MA3", "FX_Growth", "GDP_Growth",
+]
+
+_last_load = {}
+
+
+def apply_schema(df):
+    """Drop junk index columns and cast to the store's compact dtypes."""
+    df = df.drop(columns=[c for c in DROP_COLUMNS if c in df.columns])
+    casts = {}
+    for col in CATEGORY_COLUMNS:
+        if col in df.columns:
+            casts[col] = "category"
+    for col in INT16_COLUMNS:
+        if col in df.columns:
+            casts[col] = "int16"
+    for col in FLOAT32_COLUMNS:
+        if col in df.columns:
+            casts[col] = "float32"
+    return df.astype(casts)
+
+
+def build_dataset(csv_path=CSV_PATH, parquet_path=PARQUET_PATH):
+    """Write the typed Parquet dataset from the CSV and return the frame."""
+    df = apply_schema(pd.read_csv(csv_path))
+    tmp_path = parquet_path + ".tmp"
+    df.to_parquet(tmp_path, index=False)
+    os.replace(tmp_path, parquet_path)
+    return df
+
+
+def dataset_version(csv_path=CSV_PATH):
+    """Cheap version stamp of the source data (changes when the CSV is replaced)."""
+    st = os.stat(csv_path)
+    return f"{st.st_mtime_ns}-{st.st_size}"
+
+
+def _parquet_is_fresh(csv_path, parquet_path):
+    if not os.path.exists(parquet_path):
+        return False
+    return not os.path.exists(csv_path) or os.path.getmtime(parquet_path) >= os.path.getmtime(csv_path)
+
+
+def load_dataset(columns=None, csv_path=CSV_PATH, parquet_path=PARQUET_PATH, build=True):
+    """Load the typed dataset, reading only `columns` when given.
+
+    Reads Parquet when it is at least as new as the CSV. Otherwise the CSV
+    is parsed (and, with `build=True`, the Parquet file is rebuilt for the
+    next cold start). Load stats are available from `last_load_stats()`.
+    """
+    start = time.perf_counter()
+    source = "parquet"
+    df = None
+    if _parquet_is_fresh(csv_path, parquet_path):
+        try:
+            df = pd.read_parquet(parquet_path, columns=columns)
+        except Exception as e:
+            print(f"Parquet load failed, falling back to CSV: {e}")
+
+    if df is None:
+        source = "csv"
+        full = None
+        if build:
+            try:
+                full = build_dataset(csv_path, parquet_path)
+            except Exception as e:
+                print(f"Could not build {parquet_path}: {e}")
+        if full is None:
+            full = apply_schema(pd.read_csv(csv_path))
+        df = full[columns] if columns is not None else full
+
+    _last_load.clear()
+    _last_load.update({
+        "source": source,
+        "seconds": time.perf_counter() - start,
+        "memory_bytes": int(df.memory_usage(deep=True).sum()),
+        "rows": len(df),
+        "columns": len(df.columns),
+    })
+    return df
+
+
+def last_load_stats():
+    """Source, load time and in-memory size of the most recent load."""
+    return dict(_last_load)
+
+
+if __name__ == "__main__":
+    frame = build_dataset()
+    print(f"Wrote {PARQUET_PATH}: {len(frame)} rows, "
+          f"{frame.memory_usage(deep=True).sum() / 1024:.0f} KiB in memory")
@@ -0,0 +1,50 @@
+# Download payloads for the Raw Data & Download page.
+#
+# `filter_dataset()` narrows the export predictions to a year range and
+# optional sections / products; `export_bytes()` serializes a frame as CSV,
+# gzip-compressed CSV or Parquet. app.py memoizes the pair per data version
+# and filter, so a payload is serialized once and not on every rerun.
+import gzip
+from io import BytesIO
+
+EXPORT_FORMATS = {
+    "CSV": {"extension": "csv", "mime": "text/csv"},
+    "CSV (gzip)": {"extension": "csv.gz", "mime": "application/gzip"},
+    "Parquet": {"extension": "parquet", "mime": "application/vnd.apache.parquet"},
+}
+EXPORT_BASENAME = "rwanda_exports_predictions"
+
+
+def filter_dataset(df, year_range=None, sections=None, hs2=None):
+    """Rows within `year_range` (inclusive) and, when given, the listed sections / products."""
+    mask = None
+
+    def _and(current, condition):
+        return condition if current is None else current & condition
+
+    if year_range is not None:
+        lo, hi = year_range
+        mask = _and(mask, df["Year"].between(lo, hi))
+    if sections:
+        mask = _and(mask, df["Section"].isin(sections))
+    if hs2:
+        mask = _and(mask, df["HS2"].isin(hs2))
+    return df if mask is None else df[mask]
+
+
+def export_bytes(df, fmt):
+    """Serialize `df` in one of EXPORT_FORMATS."""
+    if fmt == "CSV":
+        return df.to_csv(index=False).encode("utf-8")
+    if fmt == "CSV (gzip)":
+        return gzip.compress(df.to_csv(index=False).encode("utf-8"), compresslevel=6)
+    if fmt == "Parquet":
+        buffer = BytesIO()
+        df.to_parquet(buffer, index=False)
+        return buffer.getvalue()
+    raise ValueError(f"Unknown export format: {fmt}")
+
+
+def export_filename(fmt, year_range=None):
+    suffix = f"_{year_range[0]}-{year_range[1]}" if year_range else ""
+    return f"{EXPORT_BASENAME}{suffix}.{EXPORT_FORMATS[fmt]['extension']}"
@@ -0,0 +1,84 @@
+# Cache of built Plotly figures, shared by every session and rerun.
+#
+# Each chart is identified by a chart id, the parameters that change what it
+# shows (selected year, section, product, ...) and the version of the data it
+# was built from. The first request builds the figure with Plotly Express and
+# stores it as figure JSON; later requests rebuild the figure from that JSON
+# and skip the Express pipeline. A new data version never matches an old key,
+# and the least recently used entries are dropped past `max_entries`.
+import json
+import threading
+import time
+from collections import OrderedDict
+
+import plotly.io as pio
+
+MAX_FIGURES = 256
+
+
+class FigureCache:
+    """LRU of serialized Plotly figures keyed by (chart id, params, data version)."""
+
+    def __init__(self, max_entries=MAX_FIGURES):
+        self.max_entries = max_entries
+        self._figures = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    @staticmethod
+    def make_key(chart_id, params, data_version):
+        return (chart_id, json.dumps(params, sort_keys=True, default=str), data_version)
+
+    def _chart_stats(self, chart_id):
+        return self._stats.setdefault(chart_id, {
+            "hits": 0, "misses": 0, "build_seconds": 0.0, "load_seconds": 0.0,
+        })
+
+    def get(self, chart_id, params, data_version, build):
+        """Return the figure for this key, calling `build()` only on a miss."""
+        key = self.make_key(chart_id, params, data_version)
+        start = time.perf_counter()
+        with self._lock:
+            payload = self._figures.get(key)
+            if payload is not None:
+                self._figures.move_to_end(key)
+
+        if payload is not None:
+            fig = pio.from_json(payload)
+            with self._lock:
+                stats = self._chart_stats(chart_id)
+                stats["hits"] += 1
+                stats["load_seconds"] += time.perf_counter() - start
+            return fig
+
+        fig = build()
+        payload = fig.to_json()
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self._figures[key] = payload
+            self._figures.move_to_end(key)
+            while len(self._figures) > self.max_entries:
+                self._figures.popitem(last=False)
+            stats = self._chart_stats(chart_id)
+            stats["misses"] += 1
+            stats["build_seconds"] += elapsed
+        return fig
+
+    def clear(self):
+        with self._lock:
+            self._figures.clear()
+
+    def stats(self):
+        """Cached entry count plus per-chart hits, misses, hit rate and timings."""
+        with self._lock:
+            charts = {}
+            for chart_id, s in self._stats.items():
+                lookups = s["hits"] + s["misses"]
+                charts[chart_id] = {
+                    "hits": s["hits"],
+                    "misses": s["misses"],
+                    "hit_rate": s["hits"] / lookups if lookups else 0.0,
+                    "avg_build_seconds": s["build_seconds"] / s["misses"] if s["misses"] else 0.0,
+                    "avg_load_seconds": s["load_seconds"] / s["hits"] if s["hits"] else 0.0,
+                }
+            return {"entries": len(self._figures), "charts": charts}
@@ -0,0 +1,79 @@
+# Partner states dataset (GDP, population and coordinates per country-year).
+#
+# `load_partner_dataset()` reads the CSV, adds ISO3 codes for the choropleth
+# with one vectorized map over an ISO2 -> ISO3 table (built once from
+# pycountry, not looked up row by row) and reports every code that did not
+# map instead of silently leaving it empty.
+import os
+
+import pandas as pd
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PARTNER_DATA_PATH = os.path.join(BASE_DIR, "data", "data_with_coordinates_and_totalgdp.csv")
+
+_iso3_table = None
+
+
+def iso3_table():
+    """ISO 3166 alpha-2 -> alpha-3 codes (built on first use)."""
+    global _iso3_table
+    if _iso3_table is None:
+        try:
+            import pycountry  # only needed for the partner map page
+        except ImportError:
+            print("pycountry is not installed; partner ISO3 codes will be empty")
+            _iso3_table = {}
+        else:
+            _iso3_table = {c.alpha_2: c.alpha_3 for c in pycountry.countries}
+    return _iso3_table
+
+
+def add_iso3(df, code_column="Country_ID"):
+    """Add a Country_ISO3 column; return the frame and the sorted unmapped ISO2 codes."""
+    codes = df[code_column].astype("string").str.strip().str.upper()
+    df["Country_ISO3"] = codes.map(iso3_table())
+    missing = df["Country_ISO3"].isna()
+    unmapped = sorted(codes[missing].dropna().unique().tolist())
+    if codes.isna().any():
+        unmapped.append("<missing code>")
+    return df, unmapped
+
+
+def load_partner_dataset(path=PARTNER_DATA_PATH):
+    """Partner states frame plus a report of rows / countries whose code did not map."""
+    df = pd.read_csv(path)
+    df, unmapped = add_iso3(df)
+    df["TotalGDP"] = pd.to_numeric(df["TotalGDP"], errors="coerce")
+
+    unmapped_rows = df["Country_ISO3"].isna()
+    report = {
+        "rows": len(df),
+        "unmapped_codes": unmapped,
+        "unmapped_countries": sorted(df.loc[unmapped_rows, "Country"].dropna().unique().tolist()),
+        "unmapped_rows": int(unmapped_rows.sum()),
+    }
+    if unmapped:
+        print(f"Partner states: {report['unmapped_rows']} rows with unmapped country codes "
+              f"{unmapped} ({', '.join(report['unmapped_countries'])})")
+    return df, report
+
+
+MAP_COLUMNS = [
+    "Country", "Country_ID", "Country_ISO3", "Year", "latitude", "longitude",
+    "population", "GDP", "TotalGDP",
+]
+
+
+def country_summary(df, year=None):
+    """One row per country for the partner maps.
+
+    Without `year` each country's latest available year is used (GDP and
+    population from that year, TotalGDP is per country already). With
+    `year` only the countries that have that year are returned.
+    """
+    if year is not None:
+        rows = df[df["Year"] == year]
+    else:
+        rows = df.sort_values("Year", kind="stable").drop_duplicates("Country", keep="last")
+    columns = [c for c in MAP_COLUMNS if c in df.columns]
+    return rows[columns].sort_values("Country").reset_index(drop=True)
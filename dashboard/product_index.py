@@ -0,0 +1,87 @@
+# (Section, HS2, Year) index over the export predictions.
+#
+# The product tab used to narrow the frame with three boolean masks
+# (section, then product, then year), each a full scan. `ProductIndex`
+# sorts the rows once by section, product and year and records where each
+# section and each product starts and stops, so every selection in the tab
+# is a positional slice (plus a binary search on the year for one product).
+import numpy as np
+import pandas as pd
+
+
+class ProductIndex:
+    """Row slices of the dataset by Section, (Section, HS2) and Year."""
+
+    def __init__(self, df):
+        # Sections and products keep their order of first appearance, which
+        # is the order the selectboxes and chart legends have always shown.
+        section_codes, sections = pd.factorize(df["Section"], sort=False)
+        hs2_codes, _ = pd.factorize(df["HS2"], sort=False)
+        years = df["Year"].to_numpy()
+        order = np.lexsort((years, hs2_codes, section_codes))
+
+        self.frame = df.iloc[order].reset_index(drop=True)
+        self._years = years[order]
+        section_codes = section_codes[order]
+        hs2_codes = hs2_codes[order]
+
+        self.sections = list(sections)
+        self._section_slices = {}
+        self._product_slices = {}
+        self._products = {}
+
+        n = len(self.frame)
+        section_starts = np.flatnonzero(np.diff(section_codes, prepend=-1))
+        section_stops = np.append(section_starts[1:], n)
+        product_starts = np.flatnonzero(
+            np.diff(section_codes, prepend=-1) | np.diff(hs2_codes, prepend=-1)
+        )
+        product_stops = np.append(product_starts[1:], n)
+
+        hs2_values = self.frame["HS2"]
+        for start, stop in zip(section_starts, section_stops):
+            self._section_slices[sections[section_codes[start]]] = slice(int(start), int(stop))
+        for start, stop in zip(product_starts, product_stops):
+            section = sections[section_codes[start]]
+            hs2 = hs2_values.iat[start]
+            self._product_slices[(section, hs2)] = slice(int(start), int(stop))
+            self._products.setdefault(section, []).append(hs2)
+
+        # Row positions of each (section, year), in product order
+        self._section_year_rows = {
+            (sections[code], year): rows
+            for (code, year), rows in pd.Series(np.arange(n))
+            .groupby([section_codes, self._years]).indices.items()
+        }
+
+    # ----------------- LOOKUPS -----------------
+    def products(self, section):
+        """HS2 products of a section, in dataset order."""
+        return self._products.get(section, [])
+
+    def section(self, section):
+        """All rows of one section."""
+        return self.frame.iloc[self._section_slices.get(section, slice(0, 0))]
+
+    def product(self, section, hs2):
+        """All rows of one product, sorted by year."""
+        return self.frame.iloc[self._product_slices.get((section, hs2), slice(0, 0))]
+
+    def product_year(self, section, hs2, year):
+        """Rows of one product in one year (binary search on the year)."""
+        rows = self._product_slices.get((section, hs2), slice(0, 0))
+        years = self._years[rows]
+        lo = rows.start + int(np.searchsorted(years, year, side="left"))
+        hi = rows.start + int(np.searchsorted(years, year, side="right"))
+        return self.frame.iloc[lo:hi]
+
+    def section_year(self, section, year):
+        """Rows of one section in one year."""
+        rows = self._section_year_rows.get((section, year))
+        if rows is None:
+            return self.frame.iloc[0:0]
+        return self.frame.take(rows)
+
+
+def build_product_index(df):
+    return ProductIndex(df)
@@ -0,0 +1,263 @@
+# Startup profiling and lazy imports for the dashboard.
+#
+# With DASHBOARD_PROFILE_STARTUP=1, app.py records how long each phase of its
+# first run takes (core imports, data loading, rollups, the first page) and
+# prints the breakdown once. `lazy_import()` defers modules that only some
+# pages need (plotly.express is only touched when a figure is actually built).
+#
+# `python -m dashboard.startup` runs app.py headlessly in a fresh process
+# (Streamlit's AppTest where available, otherwise a bare script run) with
+# profiling on, and exits non-zero when the first render of the default page
+# fails or exceeds the startup budget; CI runs it to keep cold starts in
+# check. The import and data initialization phases are timed separately for
+# reference.
+import argparse
+import importlib
+import importlib.util
+import json
+import os
+import subprocess
+import sys
+import time
+from contextlib import contextmanager
+
+PROFILE_ENV = "DASHBOARD_PROFILE_STARTUP"
+STARTUP_BUDGET_SECONDS = 10.0
+RENDER_TIMEOUT_SECONDS = 300
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP_PATH = os.path.join(BASE_DIR, "app.py")
+_RENDER_MARKER = "FIRST_RENDER_REPORT "
+
+# Imported by app.py before the first page renders, in this order
+CORE_IMPORTS = ["pandas", "streamlit", "pyarrow.parquet", "plotly.io"]
+LAZY_IMPORTS = ["plotly.express", "pycountry"]
+
+
+def lazy_import(name):
+    """Return module `name`, executing it only on first attribute access."""
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        raise ImportError(f"No module named {name!r}")
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
+
+
+class StartupProfiler:
+    """Named timings of one startup, recorded as checkpoints or phases."""
+
+    def __init__(self, enabled=None):
+        if enabled is None:
+            enabled = os.environ.get(PROFILE_ENV, "").lower() in ("1", "true", "yes")
+        self.enabled = enabled
+        self.phases = []
+        self.finished = False
+        self._start = None
+        self._last = None
+
+    @property
+    def active(self):
+        return self.enabled and not self.finished
+
+    def begin(self, start=None, label="core imports"):
+        """Start timing; time since `start` (e.g. top of the script) is logged as `label`."""
+        if not self.active or self._start is not None:
+            return
+        now = time.perf_counter()
+        self._start = start if start is not None else now
+        self._last = now
+        if start is not None:
+            self.phases.append((label, now - start))
+
+    def checkpoint(self, name):
+        """Record the time since the previous checkpoint as phase `name`."""
+        if not self.active or self._start is None:
+            return
+        now = time.perf_counter()
+        self.phases.append((name, now - self._last))
+        self._last = now
+
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            if self.active:
+                self.phases.append((name, time.perf_counter() - start))
+                self._last = time.perf_counter()
+
+    def total_seconds(self):
+        return sum(seconds for _name, seconds in self.phases)
+
+    def report(self):
+        return {
+            "total_seconds": self.total_seconds(),
+            "phases": [{"phase": name, "seconds": seconds} for name, seconds in self.phases],
+        }
+
+    def format_report(self, title="Startup profile"):
+        lines = [f"{title}: {self.total_seconds():.3f}s"]
+        for name, seconds in self.phases:
+            lines.append(f"  {name:<32} {seconds:8.3f}s")
+        return "\n".join(lines)
+
+    def finish(self, title="Startup profile"):
+        """Print the breakdown once; later reruns record nothing."""
+        if not self.active:
+            return
+        self.finished = True
+        print(self.format_report(title))
+
+
+# One profiler per server process: only the first script run is recorded
+startup_profiler = StartupProfiler()
+
+
+# ----------------- CLI: budget check -----------------
+def measure_startup():
+    """Time the imports and data initialization the first page depends on."""
+    profiler = StartupProfiler(enabled=True)
+    for name in CORE_IMPORTS:
+        with profiler.phase(f"import {name}"):
+            importlib.import_module(name)
+
+    with profiler.phase("import dashboard modules"):
+        from dashboard.data_store import load_dataset, dataset_version
+        from dashboard.aggregates import build_aggregates
+        from dashboard.product_index import build_product_index
+        from dashboard.partners import load_partner_dataset, country_summary
+
+    with profiler.phase("load export dataset"):
+        dataset_version()
+        df = load_dataset()
+    with profiler.phase("build aggregates"):
+        build_aggregates(df)
+    with profiler.phase("build product index"):
+        build_product_index(df)
+
+    # Not on the startup path (first chart build, partner map page); reported for reference
+    deferred = StartupProfiler(enabled=True)
+    for name in LAZY_IMPORTS:
+        with deferred.phase(f"import {name} (lazy)"):
+            importlib.import_module(name)
+    with deferred.phase("load partner states"):
+        partners, _report = load_partner_dataset()
+        country_summary(partners)
+    return profiler, deferred
+
+
+def _render_app(app_path, timeout=RENDER_TIMEOUT_SECONDS):
+    """Child process: run the first script run of `app_path` and collect its profile."""
+    os.environ[PROFILE_ENV] = "1"
+    os.chdir(os.path.dirname(os.path.abspath(app_path)))
+    start = time.perf_counter()
+    errors = []
+    try:
+        from streamlit.testing.v1 import AppTest
+    except ImportError:
+        AppTest = None
+    if AppTest is not None:
+        mode = "apptest"
+        at = AppTest.from_file(app_path, default_timeout=timeout)
+        at.run()
+        errors = [str(e.value) for e in at.exception]
+    else:
+        # Streamlit without AppTest: bare script run, widgets return their defaults
+        import runpy
+        mode = "bare"
+        try:
+            runpy.run_path(app_path, run_name="__main__")
+        except Exception as e:
+            errors = [f"{type(e).__name__}: {e}"]
+    seconds = time.perf_counter() - start
+    # app.py imports its own copy of this module; its profiler holds the phases
+    app_profiler = importlib.import_module("dashboard.startup").startup_profiler
+    return {
+        "mode": mode,
+        "seconds": seconds,
+        "errors": errors,
+        "app_profile": app_profiler.report(),
+    }
+
+
+def measure_first_render(app_path=APP_PATH, timeout=RENDER_TIMEOUT_SECONDS):
+    """Time the first render of the default page in a fresh Python process."""
+    env = dict(os.environ, **{PROFILE_ENV: "1"})
+    cmd = [sys.executable, "-m", "dashboard.startup", "--render-child", app_path]
+    try:
+        proc = subprocess.run(cmd, cwd=BASE_DIR, env=env, capture_output=True, text=True,
+                              timeout=timeout)
+    except subprocess.TimeoutExpired:
+        return {"mode": None, "seconds": None, "errors": [f"No first render within {timeout}s"],
+                "app_profile": None}
+    for line in reversed(proc.stdout.splitlines()):
+        if line.startswith(_RENDER_MARKER):
+            return json.loads(line[len(_RENDER_MARKER):])
+    tail = (proc.stderr or proc.stdout).strip().splitlines()[-5:]
+    return {"mode": None, "seconds": None, "app_profile": None,
+            "errors": [f"Render process exited with code {proc.returncode}", *tail]}
+
+
+def format_render_report(render):
+    lines = [f"First render ({render['mode']}): "
+             + (f"{render['seconds']:.3f}s" if render["seconds"] is not None else "failed")]
+    for phase in (render["app_profile"] or {}).get("phases", []):
+        lines.append(f"  {phase['phase']:<32} {phase['seconds']:8.3f}s")
+    for error in render["errors"]:
+        lines.append(f"  error: {error}")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check dashboard startup time against a budget.")
+    parser.add_argument("--budget", type=float, default=STARTUP_BUDGET_SECONDS,
+                        help="maximum seconds until the default page has rendered")
+    parser.add_argument("--app", default=APP_PATH, help="Streamlit script to render")
+    parser.add_argument("--skip-render", action="store_true",
+                        help="only time imports and data initialization (no app run)")
+    parser.add_argument("--json", help="also write the report to this file")
+    parser.add_argument("--render-child", metavar="APP", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.render_child:
+        print(_RENDER_MARKER + json.dumps(_render_app(args.render_child)))
+        return 0
+
+    profiler, deferred = measure_startup()
+    print(profiler.format_report("Startup path"))
+    print(deferred.format_report("Deferred"))
+    report = {"budget_seconds": args.budget, "startup": profiler.report(),
+              "deferred": deferred.report()}
+
+    if args.skip_render:
+        gated, label = profiler.total_seconds(), "Imports and data initialization"
+        failed = False
+    else:
+        render = measure_first_render(args.app)
+        print(format_render_report(render))
+        report["first_render"] = render
+        gated, label = render["seconds"], "First render"
+        failed = bool(render["errors"])
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    if failed:
+        print(f"{label} failed")
+        return 1
+    if gated > args.budget:
+        print(f"{label} took {gated:.3f}s, over the {args.budget:.1f}s budget")
+        return 1
+    print(f"{label} took {gated:.3f}s (budget {args.budget:.1f}s)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,209 @@
+# Feature engineering for the recursive export forecast.
+#
+# The walk-forward loop used to rebuild all 17 engineered columns for the
+# whole history on every forecast year, with one Python lambda per product
+# per rolling feature. `FeatureEngine` sorts the panel once by (HS2, Year),
+# keeps each row's product start position, and computes lags, rolling
+# means / standard deviations and growth rates from shifted numpy arrays.
+# `update_year()` recomputes only one year's rows, which is all the loop
+# needs: a row's features depend only on that row and the rows before it.
+#
+# Semantics match the original pandas code: lags are positional within a
+# product, rolling windows use min_periods=1 and skip missing values, the
+# standard deviation uses ddof=1 (NaN with fewer than two values) and growth
+# is x / x.shift(1) - 1 without forward filling.
+import numpy as np
+import pandas as pd
+
+GROUP_COLUMN = "HS2"
+TIME_COLUMN = "Year"
+TARGET = "Exports (USD)"
+PREDICTION = "Predicted_Exports"
+
+# Engineered column -> (kind, source column, window / lag)
+FEATURE_SPECS = {
+    "Revenue_Lag1": ("lag", PREDICTION, 1),
+    "Revenue_Lag2": ("lag", PREDICTION, 2),
+    "Revenue_Lag3": ("lag", PREDICTION, 3),
+    "Revenue_MA3": ("mean", PREDICTION, 3),
+    "Revenue_MA5": ("mean", PREDICTION, 5),
+    "Revenue_STD3": ("std", PREDICTION, 3),
+    "Revenue_Growth": ("growth", PREDICTION, 1),
+    "FX_Lag1": ("lag", "Predicted_Exchange_Rate", 1),
+    "FX_Lag2": ("lag", "Predicted_Exchange_Rate", 2),
+    "FX_MA3": ("mean", "Predicted_Exchange_Rate", 3),
+    "FX_Growth": ("growth", "Predicted_Exchange_Rate", 1),
+    "FX_x_WeightedGDP": ("product", ("Predicted_Exchange_Rate", "WeightedGDP"), None),
+    "GDP_Lag1": ("lag", "GDP", 1),
+    "GDP_Lag2": ("lag", "GDP", 2),
+    "GDP_MA3": ("mean", "GDP", 3),
+    "GDP_Growth": ("growth", "GDP", 1),
+}
+ENGINEERED_FEATURES = list(FEATURE_SPECS)
+
+# Model inputs: the engineered columns plus the partner-weighted macro series
+FEATURES = [
+    "Revenue_Lag1", "Revenue_Lag2", "Revenue_Lag3",
+    "Revenue_MA3", "Revenue_MA5", "Revenue_STD3", "Revenue_Growth",
+    "FX_Lag1", "FX_Lag2", "FX_MA3", "FX_Growth", "FX_x_WeightedGDP",
+    "GDP_Lag1", "GDP_Lag2", "GDP_MA3", "GDP_Growth",
+    "WeightedGDP", "WeightedFX",
+]
+
+
+def _window(values, rows, starts, size):
+    """(len(rows), size) matrix of values[row], values[row-1], ... within the product."""
+    offsets = np.arange(size)
+    positions = rows[:, None] - offsets[None, :]
+    inside = positions >= starts[rows][:, None]
+    out = np.full(positions.shape, np.nan)
+    out[inside] = values[positions[inside]]
+    return out
+
+
+def _rolling_mean(values, rows, starts, size):
+    win = _window(values, rows, starts, size)
+    count = np.sum(~np.isnan(win), axis=1)
+    total = np.nansum(win, axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(count > 0, total / count, np.nan)
+
+
+def _rolling_std(values, rows, starts, size):
+    win = _window(values, rows, starts, size)
+    count = np.sum(~np.isnan(win), axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = np.nansum(win, axis=1) / count
+        sq = np.nansum((win - mean[:, None]) ** 2, axis=1)
+        return np.where(count > 1, np.sqrt(sq / (count - 1)), np.nan)
+
+
+def _lag(values, rows, starts, k):
+    return _window(values, rows, starts, k + 1)[:, k]
+
+
+def _growth(values, rows, starts, _k=1):
+    prev = _lag(values, rows, starts, 1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return values[rows] / prev - 1
+
+
+_KINDS = {"lag": _lag, "mean": _rolling_mean, "std": _rolling_std, "growth": _growth}
+
+
+def feature_block(sources, rows, starts, features=FEATURES):
+    """(len(rows), len(features)) matrix of `features` at row positions `rows`.
+
+    `sources` maps column names to float64 arrays over the sorted panel and
+    `starts` is each row's product start position (FeatureEngine.starts).
+    Columns that are not engineered features are taken from `sources` as is.
+    """
+    rows = np.asarray(rows, dtype=int)
+    out = np.empty((rows.size, len(features)))
+    for j, name in enumerate(features):
+        spec = FEATURE_SPECS.get(name)
+        if spec is None:
+            out[:, j] = sources[name][rows]
+            continue
+        kind, source, size = spec
+        if kind == "product":
+            left, right = source
+            out[:, j] = sources[left][rows] * sources[right][rows]
+        else:
+            out[:, j] = _KINDS[kind](sources[source], rows, starts, size)
+    return out
+
+
+def feature_sources(features=FEATURES):
+    """Columns `feature_block()` reads to build `features`."""
+    columns = []
+    for name in features:
+        spec = FEATURE_SPECS.get(name)
+        needed = [name] if spec is None else ([*spec[1]] if spec[0] == "product" else [spec[1]])
+        columns.extend(c for c in needed if c not in columns)
+    return columns
+
+
+class FeatureEngine:
+    """Panel of products x years, sorted once, with incrementally updated features.
+
+    `frame` is the sorted panel (RangeIndex). Use `update_year()` before
+    predicting a year and `set_predictions()` to write its predictions back;
+    the latter refreshes that year's rows so they are ready as training rows.
+    """
+
+    def __init__(self, df, group_column=GROUP_COLUMN, time_column=TIME_COLUMN):
+        self.group_column = group_column
+        self.time_column = time_column
+        self.frame = df.sort_values([group_column, time_column], kind="stable").reset_index(drop=True)
+
+        codes, _ = pd.factorize(self.frame[group_column], sort=False)
+        n = len(self.frame)
+        is_start = np.ones(n, dtype=bool)
+        is_start[1:] = codes[1:] != codes[:-1]
+        # Position of the first row of each row's product
+        self._starts = np.maximum.accumulate(np.where(is_start, np.arange(n), 0))
+
+        years = self.frame[time_column].to_numpy()
+        self._rows_by_year = {
+            year: np.flatnonzero(years == year) for year in np.unique(years)
+        }
+        for name in ENGINEERED_FEATURES:
+            if name not in self.frame.columns:
+                self.frame[name] = np.nan
+            else:
+                self.frame[name] = self.frame[name].astype("float64")
+
+    @property
+    def starts(self):
+        return self._starts
+
+    @property
+    def years(self):
+        return sorted(self._rows_by_year)
+
+    def rows_for_year(self, year):
+        return self._rows_by_year.get(year, np.array([], dtype=int))
+
+    def source(self, column):
+        """Column of the sorted panel as a float64 array."""
+        return self.frame[column].to_numpy(dtype="float64", na_value=np.nan)
+
+    def compute_rows(self, rows, features=None):
+        """Recompute `features` (default: all engineered columns) for row positions `rows`."""
+        rows = np.asarray(rows, dtype=int)
+        if rows.size == 0:
+            return
+        features = features or ENGINEERED_FEATURES
+        sources = {c: self.source(c) for c in feature_sources(features)}
+        block = feature_block(sources, rows, self._starts, features)
+        cols = [self.frame.columns.get_loc(name) for name in features]
+        self.frame.iloc[rows, cols] = block
+
+    def compute_all(self):
+        """Features for every row (the full-history equivalent of the old per-year block)."""
+        self.compute_rows(np.arange(len(self.frame)))
+        return self.frame
+
+    def update_year(self, year):
+        """Recompute the features of one year's rows only."""
+        self.compute_rows(self.rows_for_year(year))
+
+    def set_predictions(self, year, values, column=PREDICTION):
+        """Write predictions for `year` and refresh that year's features.
+
+        Returns the row positions that were written.
+        """
+        rows = self.rows_for_year(year)
+        col = self.frame.columns.get_loc(column)
+        self.frame.iloc[rows, col] = np.asarray(values, dtype="float64")
+        self.compute_rows(rows, [n for n, spec in FEATURE_SPECS.items() if spec[1] == column])
+        return rows
+
+    def features_for_year(self, year, features=FEATURES):
+        return self.frame.iloc[self.rows_for_year(year)][features]
+
+
+def add_features(df, group_column=GROUP_COLUMN, time_column=TIME_COLUMN):
+    """Sorted copy of `df` with every engineered feature column computed."""
+    return FeatureEngine(df, group_column, time_column).compute_all()
@@ -0,0 +1,425 @@
+# Recursive walk-forward export forecast, scenarios and backtests.
+#
+# `walk_forward()` is the notebook's loop: for each forecast year, train an
+# XGBoost model on all earlier years (or continue the previous one, see
+# pipeline.training), predict that year, and feed the predictions into the
+# next year's lag / rolling features (via pipeline.features.FeatureEngine).
+# A scenario is the same run with multiplicative shocks applied to the macro
+# drivers of the forecast years; a backtest fold hides the actual exports
+# after a cutoff year and scores the recursive forecast against them.
+#
+# `ForecastRunner` runs independent scenarios and backtest folds on a
+# process pool. The input panel is written once into shared memory and
+# each worker attaches to it, so tasks only carry their shocks / cutoff.
+import argparse
+import os
+import time
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+from pipeline.features import FeatureEngine, FEATURES, PREDICTION, TARGET
+from pipeline.training import WalkForwardTrainer, RETRAIN_POLICIES
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_PATH = os.path.join(BASE_DIR, "data", "merged_predictions.csv")
+
+MACRO_COLUMNS = ["GDP", "Predicted_Exchange_Rate", "WeightedGDP", "WeightedFX"]
+
+# Column order of data/merged_predictions.csv (without its two junk index columns)
+OUTPUT_COLUMNS = [
+    "Section ID", "Section", "HS2 ID", "HS2", "Year", "Exports (USD)", "Share (%)",
+    "TotalExportsYear", "WeightedGDP", "WeightedFX", "Data_Type", "Revenue_Lag1",
+    "Revenue_Lag2", "Revenue_MA3", "Revenue_STD3", "Predicted_Exchange_Rate", "GDP",
+    "Predicted_Exports", "Revenue_Lag3", "Revenue_MA5", "Revenue_Growth", "FX_Lag1",
+    "FX_Lag2", "FX_MA3", "FX_Growth", "FX_x_WeightedGDP", "GDP_Lag1", "GDP_Lag2",
+    "GDP_MA3", "GDP_Growth", "Exports_Filled",
+]
+PANEL_COLUMNS = [
+    "Section ID", "Section", "HS2 ID", "HS2", "Year", "Exports (USD)", "Share (%)",
+    "TotalExportsYear", "Data_Type", *MACRO_COLUMNS,
+]
+LABEL_COLUMNS = ["Section", "HS2", "Data_Type"]
+
+
+# ----------------- SINGLE RUN -----------------
+def load_panel(path=DATA_PATH):
+    """Forecast input panel: actual exports, macro drivers, forecast years blank."""
+    df = pd.read_csv(path)
+    return prepare_panel(df)
+
+
+def prepare_panel(df):
+    panel = df[PANEL_COLUMNS].copy()
+    forecast = panel["Data_Type"] == "Forecast"
+    panel.loc[forecast, ["Exports (USD)", "Share (%)", "TotalExportsYear"]] = np.nan
+    panel[PREDICTION] = panel["Exports (USD)"]
+    return panel
+
+
+def forecast_years_of(panel):
+    return sorted(panel.loc[panel["Data_Type"] == "Forecast", "Year"].unique().tolist())
+
+
+def apply_scenario(panel, shocks, from_year=None):
+    """Copy of `panel` with macro drivers scaled from `from_year` on.
+
+    `shocks` maps a macro column to a factor (1.10 = +10%) or to a
+    {year: factor} dict. `from_year` defaults to the first forecast year.
+    """
+    panel = panel.copy()
+    if not shocks:
+        return panel
+    if from_year is None:
+        from_year = forecast_years_of(panel)[0]
+    years = panel["Year"]
+    for column, factor in shocks.items():
+        if column not in MACRO_COLUMNS:
+            raise ValueError(f"Unknown macro driver: {column}")
+        if isinstance(factor, dict):
+            scale = years.map(factor).fillna(1.0).where(years >= from_year, 1.0)
+        else:
+            scale = np.where(years >= from_year, float(factor), 1.0)
+        panel[column] = panel[column] * scale
+    return panel
+
+
+def apply_macro_overrides(panel, overrides):
+    """Copy of `panel` with macro drivers set to explicit values.
+
+    `overrides` maps a macro column to {year: value}.
+    """
+    panel = panel.copy()
+    for column, values in (overrides or {}).items():
+        if column not in MACRO_COLUMNS:
+            raise ValueError(f"Unknown macro driver: {column}")
+        for year, value in values.items():
+            panel.loc[panel["Year"] == year, column] = float(value)
+    return panel
+
+
+def write_year_totals(frame, positions, predictions):
+    """Set TotalExportsYear and Share (%) of one predicted year."""
+    total = float(np.sum(predictions))
+    frame.iloc[positions, frame.columns.get_loc("TotalExportsYear")] = total
+    frame.iloc[positions, frame.columns.get_loc("Share (%)")] = predictions / total if total else np.nan
+
+
+def walk_forward(panel, forecast_years=None, trainer=None, log=print, models=None):
+    """Recursive forecast of `forecast_years`; returns the merged predictions table.
+
+    `trainer` (a WalkForwardTrainer, "full" policy by default) fits each
+    year's model and keeps the per-year fit log. Pass a dict as `models` to
+    collect the fitted model of every year.
+    """
+    if forecast_years is None:
+        forecast_years = forecast_years_of(panel)
+    if trainer is None:
+        trainer = WalkForwardTrainer()
+    engine = FeatureEngine(panel)
+    engine.compute_all()
+    frame = engine.frame
+    years = frame["Year"].to_numpy()
+
+    for year in forecast_years:
+        start = time.perf_counter()
+        engine.update_year(year)
+        train = frame[(years < year) & frame[PREDICTION].notna().to_numpy()]
+        model = trainer.fit(year, train, FEATURES, PREDICTION)
+        if models is not None:
+            models[year] = model
+
+        rows = engine.features_for_year(year)
+        predictions = model.predict(rows)
+        positions = engine.set_predictions(year, predictions)
+
+        write_year_totals(frame, positions, predictions)
+        if log:
+            fit = trainer.fits[-1]
+            log(f"Predicted {year}: {len(positions)} products in {time.perf_counter() - start:.1f}s "
+                f"({fit['mode']} fit on {fit['rows']} rows, {fit['trees']} trees)")
+
+    return finalize(frame)
+
+
+def finalize(frame):
+    """Order and fill columns like data/merged_predictions.csv."""
+    out = frame.copy()
+    out["Exports_Filled"] = out["Exports (USD)"].fillna(out[PREDICTION])
+    return out[OUTPUT_COLUMNS]
+
+
+def score(actual, predicted):
+    actual = np.asarray(actual, dtype="float64")
+    predicted = np.asarray(predicted, dtype="float64")
+    err = predicted - actual
+    ss_res = float(np.sum(err ** 2))
+    ss_tot = float(np.sum((actual - actual.mean()) ** 2))
+    return {
+        "mae": float(np.mean(np.abs(err))),
+        "rmse": float(np.sqrt(np.mean(err ** 2))),
+        "r2": 1 - ss_res / ss_tot if ss_tot else float("nan"),
+        "rows": int(actual.size),
+    }
+
+
+def backtest(panel, cutoff_year, trainer=None, log=print):
+    """Hide actual exports after `cutoff_year`, forecast them recursively and score."""
+    actual = panel[panel["Data_Type"] == "Actual"].copy()
+    test_years = sorted(actual.loc[actual["Year"] > cutoff_year, "Year"].unique().tolist())
+    if not test_years:
+        raise ValueError(f"No actual years after {cutoff_year} to backtest")
+    truth = actual.loc[actual["Year"] > cutoff_year, ["HS2", "Year", TARGET]]
+    actual.loc[actual["Year"] > cutoff_year, PREDICTION] = np.nan
+
+    if trainer is None:
+        trainer = WalkForwardTrainer()
+    start = time.perf_counter()
+    predicted = walk_forward(actual, test_years, trainer, log)
+    merged = truth.merge(predicted[["HS2", "Year", PREDICTION]], on=["HS2", "Year"])
+    result = score(merged[TARGET], merged[PREDICTION])
+    result.update({
+        "cutoff_year": cutoff_year,
+        "test_years": test_years,
+        "policy": trainer.policy,
+        "seconds": time.perf_counter() - start,
+        "fit_seconds": trainer.total_seconds(),
+        "fits": trainer.fits,
+    })
+    return result
+
+
+def compare_policies(panel, cutoff_years, model_params=None, n_jobs=None,
+                     policies=RETRAIN_POLICIES, log=print, **trainer_options):
+    """Backtest every retraining policy on every cutoff; one row per (policy, cutoff)."""
+    rows = []
+    for policy in policies:
+        for cutoff in cutoff_years:
+            trainer = WalkForwardTrainer(policy, model_params, n_jobs, **trainer_options)
+            result = backtest(panel, cutoff, trainer, log=None)
+            rows.append({k: result[k] for k in
+                         ("policy", "cutoff_year", "mae", "rmse", "r2", "seconds", "fit_seconds")})
+            if log:
+                log(f"{policy:>4} retraining, cutoff {cutoff}: MAE {result['mae']:,.0f}, "
+                    f"RMSE {result['rmse']:,.0f}, R2 {result['r2']:.3f}, "
+                    f"{result['fit_seconds']:.1f}s fitting")
+    return pd.DataFrame(rows)
+
+
+# ----------------- SHARED-MEMORY PANEL -----------------
+class SharedPanel:
+    """A panel frame stored as one float64 block in shared memory.
+
+    Label columns are stored as integer codes; their categories travel with
+    the (small) `spec` that workers use to attach.
+    """
+
+    def __init__(self, panel):
+        columns = list(panel.columns)
+        categories = {}
+        block = np.empty((len(panel), len(columns)), dtype="float64")
+        for i, col in enumerate(columns):
+            if col in LABEL_COLUMNS:
+                codes, uniques = pd.factorize(panel[col])
+                categories[col] = list(uniques)
+                block[:, i] = codes
+            else:
+                block[:, i] = panel[col].to_numpy(dtype="float64", na_value=np.nan)
+
+        self.shm = shared_memory.SharedMemory(create=True, size=max(block.nbytes, 1))
+        view = np.ndarray(block.shape, dtype=block.dtype, buffer=self.shm.buf)
+        view[:] = block
+        self.spec = {
+            "name": self.shm.name,
+            "shape": block.shape,
+            "columns": columns,
+            "categories": categories,
+            "int_columns": [c for c in columns if pd.api.types.is_integer_dtype(panel[c])],
+        }
+
+    @staticmethod
+    def attach(spec):
+        """(SharedMemory handle, DataFrame copy) for a worker."""
+        shm = shared_memory.SharedMemory(name=spec["name"])
+        block = np.ndarray(spec["shape"], dtype="float64", buffer=shm.buf)
+        frame = pd.DataFrame(block.copy(), columns=spec["columns"])
+        for col, uniques in spec["categories"].items():
+            frame[col] = np.asarray(uniques, dtype=object)[frame[col].to_numpy(dtype=int)]
+        for col in spec["int_columns"]:
+            frame[col] = frame[col].astype("int64")
+        return shm, frame
+
+    def close(self):
+        self.shm.close()
+        try:
+            self.shm.unlink()
+        except FileNotFoundError:
+            pass
+
+
+_worker_shm = None
+_worker_panel = None
+
+
+def _init_worker(spec):
+    global _worker_shm, _worker_panel
+    _worker_shm, _worker_panel = SharedPanel.attach(spec)
+
+
+def _scenario_task(name, shocks, trainer_options, panel=None):
+    panel = _worker_panel if panel is None else panel
+    start = time.perf_counter()
+    trainer = WalkForwardTrainer(**trainer_options)
+    result = walk_forward(apply_scenario(panel, shocks), None, trainer, log=None)
+    return name, result, time.perf_counter() - start
+
+
+def _backtest_task(cutoff_year, trainer_options, panel=None):
+    panel = _worker_panel if panel is None else panel
+    start = time.perf_counter()
+    result = backtest(panel, cutoff_year, WalkForwardTrainer(**trainer_options), log=None)
+    return cutoff_year, result, time.perf_counter() - start
+
+
+# ----------------- RUNNER -----------------
+class ForecastRunner:
+    """Run scenarios and backtest folds in parallel against one shared panel."""
+
+    def __init__(self, panel, workers=None, model_params=None, policy="full", **trainer_options):
+        cpus = os.cpu_count() or 1
+        self.workers = max(1, workers or cpus)
+        # Split the cores between processes instead of oversubscribing them
+        self.trainer_options = dict(
+            trainer_options, policy=policy, model_params=model_params,
+            n_jobs=max(1, cpus // self.workers),
+        )
+        self.panel = panel
+        self._shared = None
+        self._pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _executor(self):
+        if self._pool is None:
+            self._shared = SharedPanel(self.panel)
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=mp.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(self._shared.spec,),
+            )
+        return self._pool
+
+    def run(self, scenarios=None, backtest_cutoffs=(), log=print):
+        """Run every scenario ({name: shocks}) and backtest cutoff.
+
+        Returns {"scenarios": {name: predictions}, "backtests": {cutoff: metrics},
+        "seconds": {task: wall time}}.
+        """
+        scenarios = scenarios if scenarios is not None else {"baseline": {}}
+        results = {"scenarios": {}, "backtests": {}, "seconds": {}}
+
+        if self.workers == 1:
+            outputs = [
+                _scenario_task(n, s, self.trainer_options, self.panel)
+                for n, s in scenarios.items()
+            ]
+            folds = [
+                _backtest_task(c, self.trainer_options, self.panel)
+                for c in backtest_cutoffs
+            ]
+        else:
+            pool = self._executor()
+            scenario_futures = [
+                pool.submit(_scenario_task, n, s, self.trainer_options)
+                for n, s in scenarios.items()
+            ]
+            fold_futures = [
+                pool.submit(_backtest_task, c, self.trainer_options)
+                for c in backtest_cutoffs
+            ]
+            outputs = [f.result() for f in scenario_futures]
+            folds = [f.result() for f in fold_futures]
+
+        for name, frame, seconds in outputs:
+            results["scenarios"][name] = frame
+            results["seconds"][f"scenario:{name}"] = seconds
+            if log:
+                log(f"Scenario {name}: {len(frame)} rows in {seconds:.1f}s")
+        for cutoff, metrics, seconds in folds:
+            results["backtests"][cutoff] = metrics
+            results["seconds"][f"backtest:{cutoff}"] = seconds
+            if log:
+                log(f"Backtest after {cutoff}: MAE {metrics['mae']:,.0f}, "
+                    f"RMSE {metrics['rmse']:,.0f}, R2 {metrics['r2']:.3f} ({seconds:.1f}s)")
+        return results
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+        if self._shared is not None:
+            self._shared.close()
+            self._shared = None
+
+
+def merged_predictions(results):
+    """All scenario tables stacked, with a leading Scenario column."""
+    frames = [
+        frame.assign(Scenario=name)[["Scenario", *OUTPUT_COLUMNS]]
+        for name, frame in results["scenarios"].items()
+    ]
+    return pd.concat(frames, ignore_index=True)
+
+
+# ----------------- CLI -----------------
+def _parse_scenario(text):
+    """'name:Column=1.1,Column2=0.95' -> (name, {Column: 1.1, Column2: 0.95})."""
+    name, _, body = text.partition(":")
+    shocks = {}
+    for part in filter(None, body.split(",")):
+        column, _, factor = part.partition("=")
+        shocks[column.strip()] = float(factor)
+    return name.strip(), shocks
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run export forecast scenarios and backtests.")
+    parser.add_argument("--data", default=DATA_PATH)
+    parser.add_argument("--scenario", action="append", default=[],
+                        help="name:Column=factor,... (repeatable); a baseline is always run")
+    parser.add_argument("--backtest", action="append", type=int, default=[],
+                        help="cutoff year for a backtest fold (repeatable)")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--n-estimators", type=int, default=None)
+    parser.add_argument("--policy", choices=RETRAIN_POLICIES, default="full",
+                        help="retraining policy for each forecast year")
+    parser.add_argument("--compare-retraining", action="store_true",
+                        help="backtest both retraining policies on the --backtest cutoffs and exit")
+    parser.add_argument("--output", default=os.path.join(BASE_DIR, "data", "scenario_predictions.csv"))
+    args = parser.parse_args(argv)
+
+    scenarios = {"baseline": {}}
+    scenarios.update(dict(_parse_scenario(s) for s in args.scenario))
+    model_params = {"n_estimators": args.n_estimators} if args.n_estimators else None
+
+    panel = load_panel(args.data)
+    if args.compare_retraining:
+        compare_policies(panel, args.backtest or [2021], model_params)
+        return
+    with ForecastRunner(panel, workers=args.workers, model_params=model_params,
+                        policy=args.policy) as runner:
+        results = runner.run(scenarios, args.backtest)
+    merged_predictions(results).to_csv(args.output, index=False)
+    print(f"Wrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,249 @@
+# Persisted walk-forward models and the fast re-forecast path.
+#
+# `train_and_register()` runs the walk-forward forecast once and saves every
+# forecast year's booster under models/<run_id>/ together with a JSON
+# manifest: the feature list, a hash of the input panel, the retraining
+# policy / parameters and per-year fit and training metrics (plus backtest
+# scores when asked for). models/LATEST names the newest run.
+#
+# `RegisteredRun.reforecast()` replays the recursive forecast with the saved
+# boosters instead of retraining: for each forecast year it refreshes that
+# year's features, predicts all products in one call and feeds the
+# predictions into the next year. With user-edited macro inputs this takes
+# milliseconds, which is what the dashboard's re-forecast panel uses.
+import argparse
+import hashlib
+import json
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from atomic_io import write_text_atomic
+from pipeline.features import FeatureEngine, FEATURES, PREDICTION
+from pipeline.forecast import (
+    BASE_DIR, DATA_PATH, PANEL_COLUMNS, apply_macro_overrides, backtest, finalize,
+    forecast_years_of, load_panel, score, walk_forward, write_year_totals,
+)
+from pipeline.training import WalkForwardTrainer, RETRAIN_POLICIES
+
+REGISTRY_DIR = os.path.join(BASE_DIR, "models")
+MANIFEST_NAME = "manifest.json"
+LATEST_NAME = "LATEST"
+MANIFEST_VERSION = 1
+
+
+# ----------------- MANIFEST -----------------
+def panel_hash(panel):
+    """SHA-256 of the forecast inputs (actuals and macro drivers) of `panel`."""
+    columns = panel[PANEL_COLUMNS].sort_values(["HS2", "Year"], kind="stable")
+    row_hashes = pd.util.hash_pandas_object(columns, index=False).to_numpy()
+    return hashlib.sha256(row_hashes.tobytes()).hexdigest()
+
+
+def save_manifest(run_dir, manifest):
+    """Atomically write the run manifest."""
+    write_text_atomic(os.path.join(run_dir, MANIFEST_NAME), json.dumps(manifest, indent=1, sort_keys=True))
+
+
+def load_manifest(run_dir):
+    """Return the run manifest, or None when the run has none."""
+    path = os.path.join(run_dir, MANIFEST_NAME)
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def latest_run_id(registry_dir=REGISTRY_DIR):
+    """Run ID named by models/LATEST, or None when nothing is registered."""
+    try:
+        with open(os.path.join(registry_dir, LATEST_NAME), encoding="utf-8") as f:
+            run_id = f.read().strip()
+    except OSError:
+        return None
+    return run_id or None
+
+
+def registry_version(registry_dir=REGISTRY_DIR):
+    """Cheap version stamp of the latest run; changes whenever a new run is registered."""
+    run_id = latest_run_id(registry_dir)
+    if run_id is None:
+        return None
+    try:
+        st = os.stat(os.path.join(registry_dir, run_id, MANIFEST_NAME))
+    except OSError:
+        return None
+    return (run_id, st.st_mtime_ns)
+
+
+# ----------------- SAVE -----------------
+def register_run(models, predictions, trainer, data_hash, registry_dir=REGISTRY_DIR, backtests=()):
+    """Save the boosters of one walk-forward run and its manifest; returns the run ID."""
+    run_id = time.strftime("%Y%m%d-%H%M%S") + "-" + data_hash[:8]
+    run_dir = os.path.join(registry_dir, run_id)
+    os.makedirs(run_dir, exist_ok=True)
+
+    fits = {f["year"]: f for f in trainer.fits}
+    years = predictions["Year"].to_numpy()
+    known = predictions[PREDICTION].notna().to_numpy()
+    entries = {}
+    for year, model in sorted(models.items()):
+        filename = f"year_{year}.ubj"
+        model.get_booster().save_model(os.path.join(run_dir, filename))
+        # Rows a year's model was trained on keep their features from then on
+        train = predictions[(years < year) & known]
+        metrics = score(train[PREDICTION], model.predict(train[FEATURES]))
+        fit = fits.get(year, {})
+        entries[str(year)] = {
+            "file": filename,
+            "mode": fit.get("mode"),
+            "train_rows": fit.get("rows"),
+            "trees": fit.get("trees"),
+            "fit_seconds": fit.get("seconds"),
+            "train_metrics": metrics,
+        }
+
+    try:
+        from xgboost import __version__ as xgboost_version
+    except ImportError:
+        xgboost_version = None
+    manifest = {
+        "version": MANIFEST_VERSION,
+        "run_id": run_id,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "data_hash": data_hash,
+        "features": list(FEATURES),
+        "policy": trainer.policy,
+        "model_params": trainer.model_params or {},
+        "xgboost_version": xgboost_version,
+        "years": entries,
+        "backtests": [
+            {k: v for k, v in result.items() if k != "fits"} for result in backtests
+        ],
+    }
+    save_manifest(run_dir, manifest)
+    write_text_atomic(os.path.join(registry_dir, LATEST_NAME), run_id + "\n")
+    return run_id
+
+
+def train_and_register(panel=None, policy="full", model_params=None, n_jobs=None,
+                       backtest_cutoffs=(), registry_dir=REGISTRY_DIR, log=print):
+    """Walk-forward train on `panel` (default: the merged dataset) and register the models."""
+    if panel is None:
+        panel = load_panel()
+    trainer = WalkForwardTrainer(policy, model_params, n_jobs)
+    models = {}
+    predictions = walk_forward(panel, trainer=trainer, log=log, models=models)
+    backtests = [
+        backtest(panel, cutoff, WalkForwardTrainer(policy, model_params, n_jobs), log)
+        for cutoff in backtest_cutoffs
+    ]
+    run_id = register_run(models, predictions, trainer, panel_hash(panel), registry_dir, backtests)
+    if log:
+        log(f"Registered {len(models)} models as {run_id} in {registry_dir}")
+    return run_id
+
+
+# ----------------- LOAD / RE-FORECAST -----------------
+class RegisteredRun:
+    """Boosters and manifest of one registered run, ready to re-forecast."""
+
+    def __init__(self, manifest, boosters):
+        self.manifest = manifest
+        self.boosters = boosters
+        self.features = manifest["features"]
+
+    @property
+    def run_id(self):
+        return self.manifest["run_id"]
+
+    @property
+    def years(self):
+        return sorted(self.boosters)
+
+    def matches(self, panel):
+        """True when `panel` is the data the run was trained on."""
+        return panel_hash(panel) == self.manifest["data_hash"]
+
+    def missing_years(self, panel):
+        """Forecast years of `panel` the run has no model for."""
+        return [y for y in forecast_years_of(panel) if y not in self.boosters]
+
+    def reforecast(self, panel, overrides=None):
+        """Recursive forecast of `panel` with the saved models; returns the merged predictions table.
+
+        `overrides` maps a macro column to {year: value} (see
+        pipeline.forecast.apply_macro_overrides).
+        """
+        if overrides:
+            panel = apply_macro_overrides(panel, overrides)
+        missing = self.missing_years(panel)
+        if missing:
+            raise ValueError(f"Run {self.run_id} has no model for {missing}")
+
+        engine = FeatureEngine(panel)
+        engine.compute_all()
+        frame = engine.frame
+        for year in forecast_years_of(panel):
+            engine.update_year(year)
+            rows = engine.features_for_year(year, self.features).to_numpy(dtype="float32")
+            predictions = np.asarray(self.boosters[year].inplace_predict(rows), dtype="float64")
+            positions = engine.set_predictions(year, predictions)
+            write_year_totals(frame, positions, predictions)
+        return finalize(frame)
+
+
+def load_run(run_id=None, registry_dir=REGISTRY_DIR):
+    """Load a registered run (default: the latest); None when there is none."""
+    import xgboost as xgb
+
+    run_id = run_id or latest_run_id(registry_dir)
+    if run_id is None:
+        return None
+    run_dir = os.path.join(registry_dir, run_id)
+    manifest = load_manifest(run_dir)
+    if manifest is None:
+        return None
+    boosters = {}
+    for year, entry in manifest["years"].items():
+        booster = xgb.Booster()
+        booster.load_model(os.path.join(run_dir, entry["file"]))
+        boosters[int(year)] = booster
+    return RegisteredRun(manifest, boosters)
+
+
+# ----------------- CLI -----------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Train the walk-forward models and save them to the registry.")
+    parser.add_argument("--data", default=DATA_PATH)
+    parser.add_argument("--registry", default=REGISTRY_DIR)
+    parser.add_argument("--policy", choices=RETRAIN_POLICIES, default="full")
+    parser.add_argument("--n-estimators", type=int, default=None)
+    parser.add_argument("--backtest", action="append", type=int, default=[],
+                        help="cutoff year of a backtest fold to record in the manifest (repeatable)")
+    parser.add_argument("--check", action="store_true",
+                        help="time a re-forecast of the latest run instead of training")
+    args = parser.parse_args(argv)
+
+    panel = load_panel(args.data)
+    if not args.check:
+        model_params = {"n_estimators": args.n_estimators} if args.n_estimators else None
+        train_and_register(panel, args.policy, model_params, backtest_cutoffs=args.backtest,
+                           registry_dir=args.registry)
+
+    run = load_run(registry_dir=args.registry)
+    if run is None:
+        print(f"No registered run in {args.registry}")
+        return
+    if not run.matches(panel):
+        print(f"Run {run.run_id} was trained on different data")
+    start = time.perf_counter()
+    run.reforecast(panel)
+    print(f"Re-forecast {len(run.years)} years with run {run.run_id} "
+          f"in {(time.perf_counter() - start) * 1000:.0f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+# What-if scenarios on the macro drivers, projected with the registered models.
+#
+# A scenario is a set of multiplicative shocks to GDP, Predicted_Exchange_Rate
+# (RWF per USD, so 1.10 is a 10% depreciation of the franc), WeightedGDP and
+# WeightedFX from a given year on; the same shocks pipeline.forecast's
+# scenario runs take. `ScenarioEngine` keeps the sorted panel as plain numpy
+# arrays, so projecting a scenario is: scale the shocked drivers, then for
+# each forecast year build the feature matrix of all HS2 products at once
+# (pipeline.features.feature_block) and predict it with that year's saved
+# booster in one call. Years stay sequential because each year's lag and
+# rolling features depend on the previous year's predictions.
+#
+# Projections are cached per scenario hash (shocks + start year), least
+# recently used first out, so moving a slider back to a previous position
+# costs a dictionary lookup.
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from pipeline.features import FeatureEngine, PREDICTION, feature_block, feature_sources
+from pipeline.forecast import MACRO_COLUMNS, apply_scenario, forecast_years_of
+
+# Driver column -> label shown next to its shock
+SCENARIO_DRIVERS = {
+    "GDP": "Rwanda GDP",
+    "Predicted_Exchange_Rate": "Exchange rate (RWF/USD, + = franc depreciation)",
+    "WeightedGDP": "Partner-weighted GDP",
+    "WeightedFX": "Partner-weighted exchange rate",
+}
+MAX_SCENARIOS = 128
+
+
+def normalize_shocks(shocks):
+    """Sorted {column: factor} without no-op shocks; {year: factor} dicts keep int years."""
+    out = {}
+    for column, factor in sorted((shocks or {}).items()):
+        if column not in MACRO_COLUMNS:
+            raise ValueError(f"Unknown macro driver: {column}")
+        if isinstance(factor, dict):
+            factor = {int(y): float(f) for y, f in sorted(factor.items()) if float(f) != 1.0}
+            if factor:
+                out[column] = factor
+        elif float(factor) != 1.0:
+            out[column] = float(factor)
+    return out
+
+
+def scenario_hash(shocks, from_year=None):
+    """Stable ID of a scenario; equal shocks give equal hashes."""
+    payload = json.dumps([normalize_shocks(shocks), from_year], sort_keys=True)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()[:16]
+
+
+def shocks_from_percent(changes):
+    """{column: percent change} -> {column: factor}, e.g. {"GDP": -5} -> {"GDP": 0.95}."""
+    return normalize_shocks({c: 1 + p / 100 for c, p in changes.items()})
+
+
+class ScenarioEngine:
+    """Scenario projections of one panel with one registered run's boosters."""
+
+    def __init__(self, run, panel, max_entries=MAX_SCENARIOS):
+        self.run = run
+        self.max_entries = max_entries
+        engine = FeatureEngine(panel)
+        self.frame = engine.frame
+        self.forecast_years = forecast_years_of(self.frame)
+        missing = run.missing_years(self.frame)
+        if missing:
+            raise ValueError(f"Run {run.run_id} has no model for {missing}")
+
+        self._starts = engine.starts
+        self._rows = {year: engine.rows_for_year(year) for year in self.forecast_years}
+        self._sources = {c: engine.source(c) for c in feature_sources(run.features)}
+        self._drivers = self.frame[["Year", "Data_Type", *MACRO_COLUMNS]]
+        self._projections = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _project(self, shocks, from_year):
+        sources = dict(self._sources)
+        if shocks:
+            shocked = apply_scenario(self._drivers, shocks, from_year)
+            for column in shocks:
+                if column in sources:
+                    sources[column] = shocked[column].to_numpy(dtype="float64")
+        predictions = sources[PREDICTION].copy()
+        sources[PREDICTION] = predictions
+        for year in self.forecast_years:
+            rows = self._rows[year]
+            features = feature_block(sources, rows, self._starts, self.run.features)
+            predictions[rows] = self.run.boosters[year].inplace_predict(features.astype("float32"))
+        return predictions
+
+    def project(self, shocks=None, from_year=None):
+        """Predicted exports of every panel row (sorted by HS2, Year) under `shocks`."""
+        shocks = normalize_shocks(shocks)
+        key = scenario_hash(shocks, from_year)
+        with self._lock:
+            predictions = self._projections.get(key)
+            if predictions is not None:
+                self._projections.move_to_end(key)
+                self.hits += 1
+                return predictions
+
+        predictions = self._project(shocks, from_year)
+        predictions.flags.writeable = False
+        with self._lock:
+            self.misses += 1
+            self._projections[key] = predictions
+            while len(self._projections) > self.max_entries:
+                self._projections.popitem(last=False)
+        return predictions
+
+    def projection_frame(self, shocks=None, from_year=None):
+        """Section, HS2, Year, Data_Type and the scenario's Predicted_Exports."""
+        out = self.frame[["Section", "HS2", "Year", "Data_Type"]].copy()
+        out[PREDICTION] = self.project(shocks, from_year)
+        return out
+
+    def compare_totals(self, shocks, from_year=None):
+        """Total exports per year: baseline, scenario and change in percent."""
+        years = self.frame["Year"]
+        totals = pd.DataFrame({
+            "Baseline": pd.Series(self.project(), index=self.frame.index).groupby(years).sum(),
+            "Scenario": pd.Series(self.project(shocks, from_year), index=self.frame.index).groupby(years).sum(),
+        }).rename_axis("Year").reset_index()
+        totals["Change (%)"] = (totals["Scenario"] / totals["Baseline"] - 1) * 100
+        return totals
+
+    def compare_products(self, shocks, year, from_year=None):
+        """Per-product exports of `year`: baseline, scenario and change, largest changes first."""
+        rows = self.frame["Year"].to_numpy() == year
+        out = self.frame.loc[rows, ["Section", "HS2"]].copy()
+        out["Baseline"] = self.project()[rows]
+        out["Scenario"] = self.project(shocks, from_year)[rows]
+        out["Change (USD)"] = out["Scenario"] - out["Baseline"]
+        out["Change (%)"] = (out["Scenario"] / out["Baseline"] - 1) * 100
+        return out.sort_values("Change (USD)", key=np.abs, ascending=False).reset_index(drop=True)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._projections),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }